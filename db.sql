@@ -36,6 +36,55 @@ CREATE TABLE `connections` (
 
 -- --------------------------------------------------------
 
+--
+-- Tabellenstruktur für Tabelle `connection_events`
+--
+
+CREATE TABLE `connection_events` (
+  `id` int(11) NOT NULL,
+  `connection` int(11) NOT NULL,
+  `user` int(11) NOT NULL,
+  `kind` varchar(16) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Tabellenstruktur für Tabelle `friend_pending`
+--
+
+CREATE TABLE `friend_pending` (
+  `id` int(11) NOT NULL,
+  `user` int(11) NOT NULL,
+  `movie` int(11) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Tabellenstruktur für Tabelle `group_members`
+--
+
+CREATE TABLE `group_members` (
+  `id` int(11) NOT NULL,
+  `user_group` int(11) NOT NULL,
+  `user` int(11) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Tabellenstruktur für Tabelle `matches`
+--
+
+CREATE TABLE `matches` (
+  `id` int(11) NOT NULL,
+  `connection` int(11) NOT NULL,
+  `movie` int(11) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Tabellenstruktur für Tabelle `movies`
 --
@@ -45,7 +94,10 @@ CREATE TABLE `movies` (
   `api_id` int(11) NOT NULL,
   `title` varchar(255) NOT NULL,
   `release_date` date NOT NULL,
-  `picture` blob DEFAULT NULL,
+  `poster` char(64) DEFAULT NULL,
+  `poster_path` varchar(255) DEFAULT NULL,
+  `genre_mask` bigint(20) UNSIGNED NOT NULL DEFAULT 0,
+  `genres` varchar(255) DEFAULT NULL,
   `page` int(11) NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
 
@@ -98,6 +150,18 @@ CREATE TABLE `users` (
   `password` varchar(255) NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
 
+-- --------------------------------------------------------
+
+--
+-- Tabellenstruktur für Tabelle `user_groups`
+--
+
+CREATE TABLE `user_groups` (
+  `id` int(11) NOT NULL,
+  `name` varchar(255) NOT NULL,
+  `owner` int(11) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
 --
 -- Indizes der exportierten Tabellen
 --
@@ -107,21 +171,56 @@ CREATE TABLE `users` (
 --
 ALTER TABLE `connections`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `user1` (`user1`),
-  ADD KEY `user2` (`user2`);
+  ADD KEY `user1` (`user1`,`active`,`id`),
+  ADD KEY `user2` (`user2`,`active`,`id`);
+
+--
+-- Indizes für die Tabelle `connection_events`
+--
+ALTER TABLE `connection_events`
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `user_id` (`user`,`id`),
+  ADD KEY `connection` (`connection`);
+
+--
+-- Indizes für die Tabelle `friend_pending`
+--
+ALTER TABLE `friend_pending`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `user_movie` (`user`,`movie`),
+  ADD KEY `user_id` (`user`,`id`),
+  ADD KEY `movie` (`movie`);
+
+--
+-- Indizes für die Tabelle `group_members`
+--
+ALTER TABLE `group_members`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `user_group_user` (`user_group`,`user`),
+  ADD KEY `user` (`user`);
+
+--
+-- Indizes für die Tabelle `matches`
+--
+ALTER TABLE `matches`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `connection_movie` (`connection`,`movie`),
+  ADD KEY `movie` (`movie`);
 
 --
 -- Indizes für die Tabelle `movies`
 --
 ALTER TABLE `movies`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `api_id` (`api_id`);
 
 --
 -- Indizes für die Tabelle `movie_genres`
 --
 ALTER TABLE `movie_genres`
   ADD PRIMARY KEY (`id`),
-  ADD UNIQUE KEY `name` (`name`);
+  ADD UNIQUE KEY `name` (`name`),
+  ADD UNIQUE KEY `api_id` (`api_id`);
 
 --
 -- Indizes für die Tabelle `movie_user_interests`
@@ -129,14 +228,16 @@ ALTER TABLE `movie_genres`
 ALTER TABLE `movie_user_interests`
   ADD PRIMARY KEY (`id`),
   ADD KEY `user` (`user`),
-  ADD KEY `movie` (`movie`);
+  ADD UNIQUE KEY `user_movie` (`user`,`movie`),
+  ADD KEY `movie` (`movie`),
+  ADD KEY `user_movie_liked` (`user`,`movie`,`liked`);
 
 --
 -- Indizes für die Tabelle `movie_x_genres`
 --
 ALTER TABLE `movie_x_genres`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `movieid` (`movie`),
+  ADD UNIQUE KEY `movie_genre` (`movie`,`genre`),
   ADD KEY `genre` (`genre`);
 
 --
@@ -146,6 +247,13 @@ ALTER TABLE `users`
   ADD PRIMARY KEY (`id`),
   ADD UNIQUE KEY `email` (`email`);
 
+--
+-- Indizes für die Tabelle `user_groups`
+--
+ALTER TABLE `user_groups`
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `owner` (`owner`);
+
 --
 -- AUTO_INCREMENT für exportierte Tabellen
 --
@@ -156,6 +264,30 @@ ALTER TABLE `users`
 ALTER TABLE `connections`
   MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT für Tabelle `connection_events`
+--
+ALTER TABLE `connection_events`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT für Tabelle `friend_pending`
+--
+ALTER TABLE `friend_pending`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT für Tabelle `group_members`
+--
+ALTER TABLE `group_members`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT für Tabelle `matches`
+--
+ALTER TABLE `matches`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT für Tabelle `movies`
 --
@@ -186,6 +318,12 @@ ALTER TABLE `movie_x_genres`
 ALTER TABLE `users`
   MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT für Tabelle `user_groups`
+--
+ALTER TABLE `user_groups`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- Constraints der exportierten Tabellen
 --
@@ -197,6 +335,34 @@ ALTER TABLE `connections`
   ADD CONSTRAINT `connections_ibfk_1` FOREIGN KEY (`user1`) REFERENCES `users` (`id`),
   ADD CONSTRAINT `connections_ibfk_2` FOREIGN KEY (`user2`) REFERENCES `users` (`id`);
 
+--
+-- Constraints der Tabelle `connection_events`
+--
+ALTER TABLE `connection_events`
+  ADD CONSTRAINT `connection_events_ibfk_1` FOREIGN KEY (`connection`) REFERENCES `connections` (`id`),
+  ADD CONSTRAINT `connection_events_ibfk_2` FOREIGN KEY (`user`) REFERENCES `users` (`id`);
+
+--
+-- Constraints der Tabelle `friend_pending`
+--
+ALTER TABLE `friend_pending`
+  ADD CONSTRAINT `friend_pending_ibfk_1` FOREIGN KEY (`user`) REFERENCES `users` (`id`),
+  ADD CONSTRAINT `friend_pending_ibfk_2` FOREIGN KEY (`movie`) REFERENCES `movies` (`id`);
+
+--
+-- Constraints der Tabelle `group_members`
+--
+ALTER TABLE `group_members`
+  ADD CONSTRAINT `group_members_ibfk_1` FOREIGN KEY (`user_group`) REFERENCES `user_groups` (`id`),
+  ADD CONSTRAINT `group_members_ibfk_2` FOREIGN KEY (`user`) REFERENCES `users` (`id`);
+
+--
+-- Constraints der Tabelle `matches`
+--
+ALTER TABLE `matches`
+  ADD CONSTRAINT `matches_ibfk_1` FOREIGN KEY (`connection`) REFERENCES `connections` (`id`),
+  ADD CONSTRAINT `matches_ibfk_2` FOREIGN KEY (`movie`) REFERENCES `movies` (`id`);
+
 --
 -- Constraints der Tabelle `movie_user_interests`
 --
@@ -210,6 +376,12 @@ ALTER TABLE `movie_user_interests`
 ALTER TABLE `movie_x_genres`
   ADD CONSTRAINT `genrefk` FOREIGN KEY (`genre`) REFERENCES `movie_genres` (`id`),
   ADD CONSTRAINT `moviefk` FOREIGN KEY (`movie`) REFERENCES `movies` (`id`);
+
+--
+-- Constraints der Tabelle `user_groups`
+--
+ALTER TABLE `user_groups`
+  ADD CONSTRAINT `user_groups_ibfk_1` FOREIGN KEY (`owner`) REFERENCES `users` (`id`);
 COMMIT;
 
 /*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
@@ -0,0 +1,107 @@
+--
+-- SQLite version of db.sql for the embedded storage backend
+--
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS `users` (
+  `id` INTEGER PRIMARY KEY,
+  `email` varchar(255) NOT NULL UNIQUE,
+  `password` varchar(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `connections` (
+  `id` INTEGER PRIMARY KEY,
+  `user1` int NOT NULL REFERENCES `users` (`id`),
+  `user2` int NOT NULL REFERENCES `users` (`id`),
+  `active` tinyint NOT NULL DEFAULT 0
+);
+-- Keyset pages of a user's connections seek on (user, active, id)
+DROP INDEX IF EXISTS `connections_user1`;
+DROP INDEX IF EXISTS `connections_user2`;
+CREATE INDEX IF NOT EXISTS `connections_user1_active` ON `connections` (`user1`, `active`, `id`);
+CREATE INDEX IF NOT EXISTS `connections_user2_active` ON `connections` (`user2`, `active`, `id`);
+
+CREATE TABLE IF NOT EXISTS `connection_events` (
+  `id` INTEGER PRIMARY KEY,
+  `connection` int NOT NULL REFERENCES `connections` (`id`),
+  `user` int NOT NULL REFERENCES `users` (`id`),
+  `kind` varchar(16) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS `connection_events_user_id` ON `connection_events` (`user`, `id`);
+CREATE INDEX IF NOT EXISTS `connection_events_connection` ON `connection_events` (`connection`);
+
+CREATE TABLE IF NOT EXISTS `movies` (
+  `id` INTEGER PRIMARY KEY,
+  `api_id` int NOT NULL UNIQUE,
+  `title` varchar(255) NOT NULL,
+  `release_date` date NOT NULL,
+  `poster` char(64) DEFAULT NULL,
+  `poster_path` varchar(255) DEFAULT NULL,
+  `genre_mask` bigint NOT NULL DEFAULT 0,
+  `genres` varchar(255) DEFAULT NULL,
+  `page` int NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `movie_genres` (
+  `id` INTEGER PRIMARY KEY,
+  `api_id` int NOT NULL UNIQUE,
+  `name` varchar(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS `movie_x_genres` (
+  `id` INTEGER PRIMARY KEY,
+  `movie` int NOT NULL REFERENCES `movies` (`id`),
+  `genre` int NOT NULL REFERENCES `movie_genres` (`id`),
+  UNIQUE (`movie`, `genre`)
+);
+CREATE INDEX IF NOT EXISTS `movie_x_genres_genre` ON `movie_x_genres` (`genre`);
+
+CREATE TABLE IF NOT EXISTS `movie_user_interests` (
+  `id` INTEGER PRIMARY KEY,
+  `user` int NOT NULL REFERENCES `users` (`id`),
+  `movie` int NOT NULL REFERENCES `movies` (`id`),
+  `liked` tinyint NOT NULL
+);
+-- A user swipes a movie once, so a retried batch of swipes cannot store them twice
+CREATE UNIQUE INDEX IF NOT EXISTS `movie_user_interests_user_movie` ON `movie_user_interests` (`user`, `movie`);
+CREATE INDEX IF NOT EXISTS `movie_user_interests_user_movie_liked` ON `movie_user_interests` (`user`, `movie`, `liked`);
+CREATE INDEX IF NOT EXISTS `movie_user_interests_movie` ON `movie_user_interests` (`movie`);
+
+CREATE TABLE IF NOT EXISTS `matches` (
+  `id` INTEGER PRIMARY KEY,
+  `connection` int NOT NULL REFERENCES `connections` (`id`),
+  `movie` int NOT NULL REFERENCES `movies` (`id`),
+  UNIQUE (`connection`, `movie`)
+);
+CREATE INDEX IF NOT EXISTS `matches_movie` ON `matches` (`movie`);
+
+-- Movies liked by a user's active connections that the user has not swiped yet
+CREATE TABLE IF NOT EXISTS `friend_pending` (
+  `id` INTEGER PRIMARY KEY,
+  `user` int NOT NULL REFERENCES `users` (`id`),
+  `movie` int NOT NULL REFERENCES `movies` (`id`),
+  UNIQUE (`user`, `movie`)
+);
+CREATE INDEX IF NOT EXISTS `friend_pending_user_id` ON `friend_pending` (`user`, `id`);
+CREATE INDEX IF NOT EXISTS `friend_pending_movie` ON `friend_pending` (`movie`);
+
+CREATE TABLE IF NOT EXISTS `user_groups` (
+  `id` INTEGER PRIMARY KEY,
+  `name` varchar(255) NOT NULL,
+  `owner` int NOT NULL REFERENCES `users` (`id`)
+);
+CREATE INDEX IF NOT EXISTS `user_groups_owner` ON `user_groups` (`owner`);
+
+CREATE TABLE IF NOT EXISTS `group_members` (
+  `id` INTEGER PRIMARY KEY,
+  `user_group` int NOT NULL REFERENCES `user_groups` (`id`),
+  `user` int NOT NULL REFERENCES `users` (`id`),
+  UNIQUE (`user_group`, `user`)
+);
+CREATE INDEX IF NOT EXISTS `group_members_user` ON `group_members` (`user`);
+
+COMMIT;
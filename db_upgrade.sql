@@ -0,0 +1,98 @@
+-- Upgrades a MySQL database created from an earlier db.sql to the current schema.
+-- Run it once, then run the manage.py commands listed in the README.
+-- The new columns of `movies` are added by manage.py migrate-posters and backfill-genres.
+-- SQLite databases get the tables and indexes from db_sqlite.sql on every start.
+
+SET SQL_MODE = "NO_AUTO_VALUE_ON_ZERO";
+START TRANSACTION;
+
+--
+-- Neue Tabellen
+--
+
+CREATE TABLE IF NOT EXISTS `connection_events` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `connection` int(11) NOT NULL,
+  `user` int(11) NOT NULL,
+  `kind` varchar(16) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `user_id` (`user`,`id`),
+  KEY `connection` (`connection`),
+  CONSTRAINT `connection_events_ibfk_1` FOREIGN KEY (`connection`) REFERENCES `connections` (`id`),
+  CONSTRAINT `connection_events_ibfk_2` FOREIGN KEY (`user`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+CREATE TABLE IF NOT EXISTS `friend_pending` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `user` int(11) NOT NULL,
+  `movie` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `user_movie` (`user`,`movie`),
+  KEY `user_id` (`user`,`id`),
+  KEY `movie` (`movie`),
+  CONSTRAINT `friend_pending_ibfk_1` FOREIGN KEY (`user`) REFERENCES `users` (`id`),
+  CONSTRAINT `friend_pending_ibfk_2` FOREIGN KEY (`movie`) REFERENCES `movies` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+CREATE TABLE IF NOT EXISTS `matches` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `connection` int(11) NOT NULL,
+  `movie` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `connection_movie` (`connection`,`movie`),
+  KEY `movie` (`movie`),
+  CONSTRAINT `matches_ibfk_1` FOREIGN KEY (`connection`) REFERENCES `connections` (`id`),
+  CONSTRAINT `matches_ibfk_2` FOREIGN KEY (`movie`) REFERENCES `movies` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+CREATE TABLE IF NOT EXISTS `user_groups` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(255) NOT NULL,
+  `owner` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `owner` (`owner`),
+  CONSTRAINT `user_groups_ibfk_1` FOREIGN KEY (`owner`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+CREATE TABLE IF NOT EXISTS `group_members` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `user_group` int(11) NOT NULL,
+  `user` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `user_group_user` (`user_group`,`user`),
+  KEY `user` (`user`),
+  CONSTRAINT `group_members_ibfk_1` FOREIGN KEY (`user_group`) REFERENCES `user_groups` (`id`),
+  CONSTRAINT `group_members_ibfk_2` FOREIGN KEY (`user`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci;
+
+--
+-- Geänderte Indizes
+--
+-- The unique keys fail if the table holds duplicates, remove them first.
+--
+
+ALTER TABLE `connections`
+  DROP KEY `user1`,
+  DROP KEY `user2`,
+  ADD KEY `user1` (`user1`,`active`,`id`),
+  ADD KEY `user2` (`user2`,`active`,`id`);
+
+ALTER TABLE `movies`
+  ADD UNIQUE KEY `api_id` (`api_id`);
+
+ALTER TABLE `movie_genres`
+  ADD UNIQUE KEY `api_id` (`api_id`);
+
+-- Keep only the first swipe of a user on a movie before it becomes unique
+DELETE m1 FROM `movie_user_interests` m1
+  JOIN `movie_user_interests` m2 ON m2.`user` = m1.`user` AND m2.`movie` = m1.`movie` AND m2.`id` < m1.`id`;
+
+ALTER TABLE `movie_user_interests`
+  ADD UNIQUE KEY `user_movie` (`user`,`movie`),
+  ADD KEY `user_movie_liked` (`user`,`movie`,`liked`);
+
+ALTER TABLE `movie_x_genres`
+  ADD UNIQUE KEY `movie_genre` (`movie`,`genre`),
+  DROP KEY `movieid`;
+
+COMMIT;
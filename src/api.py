@@ -1,45 +1,135 @@
+import json
 import os
+import threading
+import time
 import requests
-import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from base import get_app_config
+from http_cache import MemoryCache, DiskCache, TieredCache
+from metrics import metrics
 
-# Install a cache for API requests with an expiration time of 3600 seconds (1 hour)
-requests_cache.install_cache('api_cache', expire_after=3600)
+
+# Responses that are retried with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 
 class ApiWrapper:
     """A wrapper class for interacting with The Movie Database (TMDb) API."""
 
     def __init__(self):
-        """Initialize the ApiWrapper with base URL and headers."""
+        """Initialize the ApiWrapper with base URL, headers, its HTTP session and response cache."""
         self.base_url = "https://api.themoviedb.org/3/"
-        self.image_base_url = "https://image.tmdb.org/t/p/w500/"
+        self.image_base_url = "https://image.tmdb.org/t/p/"
         self.headers = {
             "accept": "application/json",
             "Authorization": f"Bearer {os.environ.get('TOKEN')}"
         }
 
-    def fetch_movies(self, page=1):
+        # Discover pages change over time, genres rarely and poster images never
+        config = get_app_config().get('HttpCache', {})
+        ttls = {"discover": 3600, "genres": 86400, "image": None}
+        ttls.update(config.get('TTL', {}))
+        self.cache = TieredCache(
+            MemoryCache(config.get('MemoryBytes', 32 * 1024 * 1024)),
+            DiskCache(config.get('Path', '../http_cache'), config.get('DiskBytes', 512 * 1024 * 1024)),
+            ttls
+        )
+
+        # One keep-alive session with bounded connection pools and retries on 429/5xx
+        http_config = get_app_config().get('Http', {})
+        self.timeout = http_config.get('Timeout', 10)
+        self.retries = http_config.get('Retries', 3)
+        self.backoff_factor = http_config.get('BackoffFactor', 0.5)
+        self.backoff_jitter = http_config.get('BackoffJitter', 0.5)
+        self.pool_connections = http_config.get('PoolConnections', 4)
+        self.pool_max_size = http_config.get('PoolMaxSize', 16)
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_max_size,
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        metrics.add_collector('http_cache', 'endpoint', lambda: self.cache.stats()['endpoints'])
+
+    def __get(self, endpoint, url, headers=None, timeout=None):
         """
-        Fetch a list of movies from TMDb.
+        Send a GET request, answering it from the cache if possible.
+
+        Requests that reach the network are timed per endpoint, see metrics.
 
         Args:
-            page (int, optional): The page number to fetch. Defaults to 1.
+            endpoint (str): The cache policy to apply ("discover", "genres" or "image").
+            url (str): The URL to request.
+            headers (dict, optional): The request headers. Defaults to None.
+            timeout (float, optional): Seconds to wait for the response. Defaults to the 'Http.Timeout' setting.
 
         Returns:
-            list: A list of movie dictionaries if the request is successful, None otherwise.
+            bytes: The response body if the request is successful, None otherwise.
         """
-        url = (
+        body = self.cache.get(endpoint, url)
+        if body is not None:
+            return body
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+        except requests.RequestException:
+            metrics.observe('api', endpoint, time.perf_counter() - start, failed=True, detail=url)
+            return None
+
+        metrics.observe('api', endpoint, time.perf_counter() - start, size=len(response.content),
+                        failed=response.status_code != 200, detail=url)
+        if response.status_code != 200:
+            return None
+
+        self.cache.set(endpoint, url, response.content)
+        return response.content
+
+    def movies_url(self, page):
+        """Return the URL of a discover page."""
+        return (
             f"{self.base_url}discover/movie"
             f"?include_adult=false&include_video=false&language=de-DE"
             f"&page={page}&primary_release_date.gte=2010-01-01"
             f"&sort_by=primary_release_date.asc&vote_average.gte=6&vote_count.gte=100"
         )
-        response = requests.get(url, headers=self.headers)
 
-        if response.status_code != 200:
+    def genres_url(self):
+        """Return the URL of the genre list."""
+        return f"{self.base_url}genre/movie/list?language=de"
+
+    def image_url(self, path, size="w500"):
+        """Return the URL of a poster image in the given TMDb size."""
+        return f"{self.image_base_url}{size}/{path.lstrip('/')}"
+
+    def fetch_movies(self, page=1):
+        """
+        Fetch a list of movies from TMDb.
+
+        Args:
+            page (int, optional): The page number to fetch. Defaults to 1.
+
+        Returns:
+            list: A list of movie dictionaries if the request is successful, None otherwise.
+        """
+        body = self.__get("discover", self.movies_url(page), self.headers)
+
+        if body is None:
             return None
 
-        return response.json().get('results', [])
+        return json.loads(body).get('results', [])
 
     def fetch_movie_genres(self):
         """
@@ -48,27 +138,64 @@ class ApiWrapper:
         Returns:
             list: A list of genre dictionaries if the request is successful, None otherwise.
         """
-        url = f"{self.base_url}genre/movie/list?language=de"
-        response = requests.get(url, headers=self.headers)
+        body = self.__get("genres", self.genres_url(), self.headers)
 
-        if response.status_code != 200:
+        if body is None:
             return None
 
-        return response.json().get('genres', [])
+        return json.loads(body).get('genres', [])
 
-    def fetch_image(self, path):
+    def fetch_image(self, path, timeout=None, size="w500"):
         """
         Fetch an image from TMDb.
 
         Args:
             path (str): The path to the image.
+            timeout (float, optional): Seconds to wait for the download. Defaults to the 'Http.Timeout' setting.
+            size (str, optional): The TMDb image size, e.g. 'w185'. Defaults to 'w500'.
 
         Returns:
             bytes: The image content if the request is successful, None otherwise.
         """
-        url = f"{self.image_base_url}{path}"
-        response = requests.get(url)
+        return self.__get("image", self.image_url(path, size), timeout=timeout)
 
-        if response.status_code == 200:
-            return response.content
-        return None
+    def cache_stats(self):
+        """
+        Return the hit, miss and byte statistics of the response cache.
+
+        Returns:
+            dict: See TieredCache.stats.
+        """
+        return self.cache.stats()
+
+
+class LazyApiWrapper:
+    """
+    Creates the ApiWrapper on first use.
+
+    Setting up the HTTP session and indexing the on-disk response cache are
+    deferred until the first request, so importing modules that hold an API
+    client does not slow down application startup.
+    """
+
+    def __init__(self):
+        """Initialize the LazyApiWrapper without creating the ApiWrapper."""
+        self.__api = None
+        self.__lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the ApiWrapper, creating it on the first call.
+
+        Returns:
+            ApiWrapper: The shared ApiWrapper.
+        """
+        if self.__api is None:
+            with self.__lock:
+                if self.__api is None:
+                    self.__api = ApiWrapper()
+        return self.__api
+
+    def __getattr__(self, name):
+        """Forward attribute access to the ApiWrapper."""
+        return getattr(self.get(), name)
@@ -0,0 +1,277 @@
+import os
+import sqlite3
+import mysql.connector
+
+
+class MySqlBackend:
+    """Storage backend for a MySQL or MariaDB server, using the schema in db.sql."""
+
+    IntegrityError = mysql.connector.errors.IntegrityError
+
+    def __init__(self, config):
+        """
+        Initialize the MySqlBackend.
+
+        Args:
+            config (dict): The database configuration with Host, Username, Password and Database.
+        """
+        self.config = config
+
+    def connect(self):
+        """
+        Open a connection to the database server.
+
+        Returns:
+            MySQLConnection: The new connection.
+        """
+        return mysql.connector.connect(
+            host=self.config['Host'],
+            user=self.config['Username'],
+            password=self.config['Password'],
+            database=self.config['Database'],
+            autocommit=True,
+            # A streaming cursor closed early discards its unread rows instead of failing
+            consume_results=True
+        )
+
+    @staticmethod
+    def check(connection):
+        """
+        Check a pooled connection before it is handed out, reconnecting once if it was dropped.
+
+        Args:
+            connection (MySQLConnection): The connection to check.
+
+        Returns:
+            bool: True if the connection is usable, False otherwise.
+        """
+        try:
+            connection.ping(reconnect=True, attempts=1)
+        except mysql.connector.Error:
+            return False
+        return True
+
+    @staticmethod
+    def cursor(connection):
+        """Open a buffered cursor on a connection."""
+        return connection.cursor(buffered=True)
+
+    @staticmethod
+    def stream_cursor(connection):
+        """Open an unbuffered cursor that reads rows from the server as they are fetched."""
+        return connection.cursor(buffered=False)
+
+    @staticmethod
+    def begin(connection):
+        """Start a transaction on a connection."""
+        connection.start_transaction()
+
+    @staticmethod
+    def has_column(cursor, table, column):
+        """
+        Check whether a table has the given column.
+
+        Args:
+            cursor: An open cursor.
+            table (str): The name of the table.
+            column (str): The name of the column.
+
+        Returns:
+            bool: True if the column exists, False otherwise.
+        """
+        cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+        return cursor.fetchone() is not None
+
+
+class SqliteCursor:
+    """A cursor that accepts the MySQL dialect used by Database and runs it on SQLite."""
+
+    # MySQL constructs and their SQLite equivalents
+    TRANSLATIONS = [
+        ('%s', '?'),
+        ('INSERT IGNORE', 'INSERT OR IGNORE'),
+        ('GREATEST(', 'MAX('),
+        ('LEAST(', 'MIN(')
+    ]
+
+    def __init__(self, cursor):
+        """
+        Initialize the SqliteCursor.
+
+        Args:
+            cursor (sqlite3.Cursor): The wrapped cursor.
+        """
+        self.cursor = cursor
+
+    @classmethod
+    def translate(cls, sql_command):
+        """Rewrite a statement from the MySQL dialect into SQLite."""
+        for mysql_syntax, sqlite_syntax in cls.TRANSLATIONS:
+            sql_command = sql_command.replace(mysql_syntax, sqlite_syntax)
+        return sql_command
+
+    def execute(self, sql_command, params=()):
+        """Execute one statement."""
+        self.cursor.execute(self.translate(sql_command), params or ())
+
+    def executemany(self, sql_command, params):
+        """Execute one statement for every parameter set."""
+        self.cursor.executemany(self.translate(sql_command), params)
+
+    def fetchone(self):
+        """Return the next row, or None."""
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        """Return all remaining rows."""
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size):
+        """Return up to size of the remaining rows."""
+        return self.cursor.fetchmany(size)
+
+    def __iter__(self):
+        """Iterate over the remaining rows."""
+        return iter(self.cursor)
+
+    @property
+    def rowcount(self):
+        """The number of rows changed by the last statement."""
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        """The ID of the last inserted row."""
+        return self.cursor.lastrowid
+
+    def close(self):
+        """Close the cursor."""
+        self.cursor.close()
+
+
+class SqliteBackend:
+    """
+    Embedded storage backend using a local SQLite file.
+
+    The database is created from db_sqlite.sql, which mirrors db.sql, and runs
+    in WAL mode so readers never block the writer.
+    """
+
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, config):
+        """
+        Initialize the SqliteBackend and create missing tables.
+
+        Args:
+            config (dict): The database configuration with the file Path.
+        """
+        self.path = config.get('Path', '../movietinder.db')
+        self.schema_path = config.get('Schema', '../db_sqlite.sql')
+        connection = self.connect()
+        try:
+            self.__remove_duplicate_swipes(connection)
+            # Every statement is IF NOT EXISTS, so tables added later are created in older files too
+            with open(self.schema_path, 'r') as file:
+                connection.executescript(file.read())
+        finally:
+            connection.close()
+
+    @staticmethod
+    def __remove_duplicate_swipes(connection):
+        """
+        Keep only the first swipe of a user on a movie in files created before swipes were unique.
+
+        Args:
+            connection (sqlite3.Connection): An open connection.
+        """
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+        if 'movie_user_interests' not in tables or 'movie_user_interests_user_movie' in tables:
+            return
+        connection.execute("""
+            DELETE FROM movie_user_interests
+            WHERE id NOT IN (SELECT MIN(id) FROM movie_user_interests GROUP BY user, movie)
+        """)
+
+    def connect(self):
+        """
+        Open a connection to the database file.
+
+        Returns:
+            sqlite3.Connection: The new connection in autocommit mode.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    @staticmethod
+    def check(connection):
+        """
+        Check a pooled connection before it is handed out.
+
+        Args:
+            connection (sqlite3.Connection): The connection to check.
+
+        Returns:
+            bool: True if the connection is usable, False otherwise.
+        """
+        try:
+            connection.execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+        return True
+
+    @staticmethod
+    def cursor(connection):
+        """Open a cursor on a connection."""
+        return SqliteCursor(connection.cursor())
+
+    @staticmethod
+    def stream_cursor(connection):
+        """Open a cursor on a connection; SQLite cursors step through the rows as they are fetched."""
+        return SqliteCursor(connection.cursor())
+
+    @staticmethod
+    def begin(connection):
+        """Start a transaction that takes the write lock right away."""
+        connection.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    def has_column(cursor, table, column):
+        """
+        Check whether a table has the given column.
+
+        Args:
+            cursor (SqliteCursor): An open cursor.
+            table (str): The name of the table.
+            column (str): The name of the column.
+
+        Returns:
+            bool: True if the column exists, False otherwise.
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+
+BACKENDS = {
+    'mysql': MySqlBackend,
+    'sqlite': SqliteBackend
+}
+
+
+def create_backend(config):
+    """
+    Create the storage backend selected by the 'Backend' setting.
+
+    Args:
+        config (dict): The database configuration.
+
+    Returns:
+        The backend instance; MySQL if no backend is configured.
+    """
+    return BACKENDS[config.get('Backend', 'mysql').lower()](config)
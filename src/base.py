@@ -17,6 +17,25 @@ def get_db_config():
     return data
 
 
+def get_app_config():
+    """
+    Load and return the application settings from a JSON file.
+
+    The function reads tuning parameters from '../config/appconfig.json'.
+    Missing files yield an empty dictionary so callers can fall back to
+    their defaults.
+
+    Returns:
+        dict: Application configuration parameters.
+    """
+    try:
+        with open('../config/appconfig.json', 'r') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return {}
+    return data
+
+
 def hash_password(password):
     """
     Hash a password using SHA-256.
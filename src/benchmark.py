@@ -0,0 +1,510 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import time
+from datetime import datetime, timezone
+import database
+from base import get_db_config
+from database import Database, genre_bit
+from metrics import metrics
+from poster_store import PosterStore
+
+# Data sizes the hot paths are measured at; swipes is the average per user
+SIZES = {
+    'small': {'users': 200, 'movies': 5000, 'swipes': 500, 'connections': 6},
+    'medium': {'users': 2000, 'movies': 20000, 'swipes': 1000, 'connections': 10},
+    'large': {'users': 5000, 'movies': 50000, 'swipes': 2000, 'connections': 10}
+}
+
+# The TMDb movie genres as (API ID, name)
+GENRES = [
+    (28, 'Action'), (12, 'Adventure'), (16, 'Animation'), (35, 'Comedy'), (80, 'Crime'),
+    (99, 'Documentary'), (18, 'Drama'), (10751, 'Family'), (14, 'Fantasy'), (36, 'History'),
+    (27, 'Horror'), (10402, 'Music'), (9648, 'Mystery'), (10749, 'Romance'), (878, 'Science Fiction'),
+    (10770, 'TV Movie'), (53, 'Thriller'), (10752, 'War'), (37, 'Western')
+]
+
+# Deleted in this order when a MySQL database is reset
+TABLES = [
+    'group_members', 'user_groups', 'matches', 'friend_pending', 'movie_user_interests', 'movie_x_genres',
+    'movies', 'movie_genres', 'connection_events', 'connections', 'users'
+]
+
+CHUNK_SIZE = 10000
+LIKE_RATE = 0.4
+POSTER_VARIANTS = 256
+
+
+def fake_poster(rng, size=4096):
+    """
+    Create random bytes standing in for a poster image.
+
+    Args:
+        rng (random.Random): The random generator.
+        size (int, optional): The number of bytes. Defaults to 4096.
+
+    Returns:
+        bytes: The fake image content.
+    """
+    return b'\xff\xd8\xff' + rng.randbytes(size - 3)
+
+
+class SyntheticApi:
+    """
+    Stands in for ApiWrapper so fetch_new_movies runs without network access.
+
+    Every discover page returns movies that are not stored yet.
+    """
+
+    def __init__(self, seed, first_api_id, page_size=20):
+        """
+        Initialize the SyntheticApi.
+
+        Args:
+            seed (int): Seed of the random generator.
+            first_api_id (int): API ID of the first movie returned.
+            page_size (int, optional): Number of movies per page. Defaults to 20.
+        """
+        self.rng = random.Random(seed)
+        self.next_api_id = first_api_id
+        self.page_size = page_size
+        self.posters = [fake_poster(self.rng) for _ in range(16)]
+
+    def fetch_movies(self, page):
+        """Return a page of new movies."""
+        movies = []
+        for _ in range(self.page_size):
+            movies.append({
+                "id": self.next_api_id,
+                "title": f"Movie {self.next_api_id}",
+                "release_date": "2020-01-01",
+                "poster_path": f"/{self.next_api_id}.jpg",
+                "genre_ids": [api_id for api_id, _ in self.rng.sample(GENRES, self.rng.randint(1, 3))]
+            })
+            self.next_api_id += 1
+        return movies
+
+    def fetch_movie_genres(self):
+        """Return the genre list."""
+        return [{"id": api_id, "name": name} for api_id, name in GENRES]
+
+    def fetch_image(self, path, timeout=None, size="w500"):
+        """Return fake poster bytes."""
+        return self.rng.choice(self.posters)
+
+
+class DataGenerator:
+    """
+    Fills an empty database with synthetic users, movies, connections and swipes.
+
+    Users swipe through the movies in ID order like the deck does, so the
+    newest swiped movie of a user is also their highest movie ID.
+    """
+
+    def __init__(self, db, size, seed=0):
+        """
+        Initialize the DataGenerator.
+
+        Args:
+            db (Database): The empty database.
+            size (dict): The number of users, movies, swipes per user and connections per user.
+            seed (int, optional): Seed of the random generator. Defaults to 0.
+        """
+        self.db = db
+        self.size = size
+        self.rng = random.Random(seed)
+        self.swiped = {}
+        self.liked = {}
+        self.connections = []
+
+    def __insert(self, sql_command, rows):
+        """
+        Insert rows in chunks of CHUNK_SIZE, each in its own transaction.
+
+        Args:
+            sql_command (str): The INSERT statement for a single row.
+            rows (iterable): The row values.
+
+        Returns:
+            int: The number of rows.
+        """
+        count = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == CHUNK_SIZE:
+                with self.db.transaction() as cursor:
+                    cursor.executemany(sql_command, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            with self.db.transaction() as cursor:
+                cursor.executemany(sql_command, chunk)
+            count += len(chunk)
+        return count
+
+    def __movies(self):
+        """Yield the movie rows and record their genres."""
+        posters = [self.db.posters.put(fake_poster(self.rng)) for _ in range(POSTER_VARIANTS)]
+        self.movie_genres = []
+        for movie_id in range(1, self.size['movies'] + 1):
+            genre_ids = sorted(self.rng.sample(range(1, len(GENRES) + 1), self.rng.randint(1, 3)))
+            genre_mask = 0
+            for genre_id in genre_ids:
+                genre_mask |= genre_bit(genre_id)
+                self.movie_genres.append((movie_id, genre_id))
+            yield (
+                movie_id, movie_id, f"Movie {movie_id}", "2020-01-01", self.rng.choice(posters),
+                f"/{movie_id}.jpg", genre_mask, ', '.join(GENRES[genre_id - 1][1] for genre_id in genre_ids),
+                1 + (movie_id - 1) // 20
+            )
+
+    def __connections(self):
+        """Yield the connection rows; every user is connected to about size['connections'] others."""
+        users = self.size['users']
+        connection_id = 0
+        for user in range(1, users + 1):
+            for offset in range(1, self.size['connections'] // 2 + 1):
+                other = (user - 1 + offset) % users + 1
+                if other == user:
+                    continue
+                connection_id += 1
+                active = self.rng.random() >= 0.1
+                if active:
+                    self.connections.append((connection_id, user, other))
+                yield connection_id, user, other, active
+
+    def __interests(self):
+        """Yield the swipe rows and record the swiped and liked movies of every user."""
+        swipes = self.size['swipes']
+        # Keep enough unswiped movies so get_movies_for_user never falls back to the API
+        most = self.size['movies'] - 100
+        for user in range(1, self.size['users'] + 1):
+            count = min(self.rng.randint(swipes // 2, swipes * 3 // 2), most)
+            liked = set()
+            for movie in range(1, count + 1):
+                is_liked = self.rng.random() < LIKE_RATE
+                if is_liked:
+                    liked.add(movie)
+                yield user, movie, is_liked
+            self.swiped[user] = count
+            self.liked[user] = liked
+
+    def __matches(self):
+        """Yield the match rows of the active connections."""
+        for connection_id, user1, user2 in self.connections:
+            for movie in sorted(self.liked[user1] & self.liked[user2]):
+                yield connection_id, movie
+
+    def generate(self):
+        """
+        Write the synthetic data set.
+
+        Returns:
+            dict: The number of rows written per table.
+        """
+        counts = {}
+        counts['users'] = self.__insert(
+            "INSERT INTO users (id, email, password) VALUES (%s, %s, %s)",
+            ((user, f"user{user}@example.com", 'x' * 64) for user in range(1, self.size['users'] + 1))
+        )
+        counts['movie_genres'] = self.__insert(
+            "INSERT INTO movie_genres (id, api_id, name) VALUES (%s, %s, %s)",
+            ((genre_id, api_id, name) for genre_id, (api_id, name) in enumerate(GENRES, 1))
+        )
+        counts['movies'] = self.__insert(
+            """
+            INSERT INTO movies (id, api_id, title, release_date, poster, poster_path, genre_mask, genres, page)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            self.__movies()
+        )
+        counts['movie_x_genres'] = self.__insert(
+            "INSERT INTO movie_x_genres (movie, genre) VALUES (%s, %s)", self.movie_genres
+        )
+        counts['connections'] = self.__insert(
+            "INSERT INTO connections (id, user1, user2, active) VALUES (%s, %s, %s, %s)",
+            self.__connections()
+        )
+        counts['movie_user_interests'] = self.__insert(
+            "INSERT INTO movie_user_interests (user, movie, liked) VALUES (%s, %s, %s)",
+            self.__interests()
+        )
+        counts['matches'] = self.__insert(
+            "INSERT INTO matches (connection, movie) VALUES (%s, %s)", self.__matches()
+        )
+        return counts
+
+
+def percentile(samples, fraction):
+    """
+    Return a percentile of sorted samples using the nearest-rank method.
+
+    Args:
+        samples (list): The sorted samples.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The sample at that rank.
+    """
+    rank = max(int(round(fraction * len(samples) + 0.5)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def measure(operation, samples, warmup):
+    """
+    Time an operation repeatedly.
+
+    Args:
+        operation (callable): Called with the sample number; returns the number of rows it handled.
+        samples (int): Number of timed calls.
+        warmup (int): Number of untimed calls made first.
+
+    Returns:
+        dict: The latency percentiles in milliseconds and the row throughput.
+    """
+    for number in range(warmup):
+        operation(number)
+
+    timings = []
+    rows = 0
+    for number in range(warmup, warmup + samples):
+        start = time.perf_counter()
+        rows += operation(number)
+        timings.append(time.perf_counter() - start)
+
+    total = sum(timings)
+    timings.sort()
+    return {
+        'samples': samples,
+        'rows': rows,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'mean_ms': total / samples * 1000,
+        'rows_per_second': rows / total if total else 0.0
+    }
+
+
+def run_operations(db, generator, samples, warmup, seed=0):
+    """
+    Measure the Database hot paths on a generated data set.
+
+    Args:
+        db (Database): The database holding the generated data.
+        generator (DataGenerator): The generator that filled the database.
+        samples (int): Number of timed calls per operation.
+        warmup (int): Number of untimed calls per operation.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        dict: The measurements per operation.
+    """
+    rng = random.Random(seed)
+    users = list(generator.swiped)
+
+    def movies_for_user(_):
+        return len(db.get_movies_for_user(rng.choice(users)) or {})
+
+    def user_matches(_):
+        connection_id, user1, _ = rng.choice(generator.connections)
+        return len(db.get_user_matches(user1, connection_id) or {})
+
+    def users_connections(number):
+        return len(db.get_users_connections(rng.choice(users), pending=number % 2 == 1))
+
+    batch_size = db.swipes.batch_size
+
+    def user_interests(_):
+        user = rng.choice(users)
+        first = generator.swiped[user] + 1
+        for movie in range(first, first + batch_size):
+            db.add_user_interest(user, movie, rng.random() < LIKE_RATE)
+        generator.swiped[user] += batch_size
+        db.flush_user_interests()
+        return batch_size
+
+    def new_movies(number):
+        db.fetch_new_movies(100000 + number)
+        return database.api.page_size
+
+    return {
+        'get_movies_for_user': measure(movies_for_user, samples, warmup),
+        'get_user_matches': measure(user_matches, samples, warmup),
+        'get_users_connections': measure(users_connections, samples, warmup),
+        'add_user_interest': measure(user_interests, samples, warmup),
+        'fetch_new_movies': measure(new_movies, max(samples // 10, 1), min(warmup, 1))
+    }
+
+
+def open_database(args, name, workdir):
+    """
+    Open an empty database for one data size.
+
+    SQLite databases are created as new files in the work directory. MySQL
+    uses the server from dbconfig.json with the database given by --database,
+    whose tables are emptied first.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        name (str): The name of the data size.
+        workdir (str): Directory for database files and the poster store.
+
+    Returns:
+        Database: The empty database.
+    """
+    if args.backend == 'sqlite':
+        path = os.path.join(workdir, f"{name}.db")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        db = Database({'Backend': 'sqlite', 'Path': path, 'PoolSize': 5, 'PoolTimeout': 30})
+    else:
+        config = dict(get_db_config(), Backend='mysql', Database=args.database)
+        db = Database(config)
+        with db.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+
+    poster_path = os.path.join(workdir, f"{name}-posters")
+    shutil.rmtree(poster_path, ignore_errors=True)
+    db.posters = PosterStore(poster_path)
+    return db
+
+
+def run(args):
+    """
+    Generate every requested data size and measure the hot paths on it.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        dict: The benchmark report.
+    """
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        'label': args.label,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'samples': args.samples,
+        'sizes': {}
+    }
+
+    api = database.api
+    try:
+        for name in args.sizes:
+            size = SIZES[name]
+            print(f"[{name}] generating {size}")
+            db = open_database(args, name, args.workdir)
+            generator = DataGenerator(db, size, args.seed)
+            start = time.perf_counter()
+            counts = generator.generate()
+            generate_seconds = time.perf_counter() - start
+            print(f"[{name}] generated {counts['movie_user_interests']} swipes in {generate_seconds:.1f}s")
+
+            database.api = SyntheticApi(args.seed, 10 ** 9)
+            metrics.reset()
+            operations = run_operations(db, generator, args.samples, args.warmup, args.seed)
+            db.close()
+
+            for operation, result in operations.items():
+                print(f"[{name}] {operation:<22} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                      f"p99 {result['p99_ms']:8.2f}ms  {result['rows_per_second']:10.0f} rows/s")
+            report['sizes'][name] = {
+                'size': size,
+                'rows': counts,
+                'generate_seconds': generate_seconds,
+                'operations': operations
+            }
+            if metrics.enabled:
+                report['sizes'][name]['metrics'] = metrics.snapshot()
+    finally:
+        database.api = api
+    return report
+
+
+def compare(report, baseline):
+    """
+    Print the p95 latency change of every operation against an earlier report.
+
+    Args:
+        report (dict): The current benchmark report.
+        baseline (dict): An earlier benchmark report.
+    """
+    print(f"Compared with {baseline.get('label')} ({baseline.get('created')}):")
+    for name, size in report['sizes'].items():
+        old_size = baseline.get('sizes', {}).get(name)
+        if old_size is None:
+            continue
+        for operation, result in size['operations'].items():
+            old = old_size['operations'].get(operation)
+            if old is None or not old['p95_ms']:
+                continue
+            change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            print(f"[{name}] {operation:<22} p95 {old['p95_ms']:8.2f}ms -> {result['p95_ms']:8.2f}ms ({change:+.1f}%)")
+
+
+def default_label():
+    """
+    Return the current git commit as the report label.
+
+    Returns:
+        str: The abbreviated commit hash, or 'local' outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'local'
+
+
+def main():
+    """Parse the command line, run the benchmark and save the report."""
+    parser = argparse.ArgumentParser(description="Benchmark the Database hot paths on synthetic data")
+    parser.add_argument("--sizes", nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument("--backend", choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument("--database", default='movietinder_bench',
+                        help="MySQL database to fill, its tables are emptied (created from db.sql)")
+    parser.add_argument("--samples", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed calls per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default='../benchmarks/data',
+                        help="directory for the SQLite files and poster stores")
+    parser.add_argument("--label", default=None, help="name of this run, defaults to the git commit")
+    parser.add_argument("--output", default=None, help="defaults to ../benchmarks/<label>.json")
+    parser.add_argument("--compare", default=None, help="earlier report to compare p95 latencies with")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record per-method and per-statement metrics and add them to the report")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enabled = True
+
+    if args.label is None:
+        args.label = default_label()
+    if args.output is None:
+        args.output = f"../benchmarks/{args.label}.json"
+
+    report = run(args)
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket
+from database import api
+
+
+class CatalogSync:
+    """
+    Bulk-loads a range of TMDb discover pages into the database.
+
+    Pages are fetched concurrently under a token-bucket rate limit and stored
+    in batches. Completed pages are recorded in a checkpoint file, so an
+    interrupted sync continues with the pages that are still missing.
+    """
+
+    def __init__(self, db, checkpoint_path, requests_per_second=40, workers=8, batch_pages=10):
+        """
+        Initialize the CatalogSync.
+
+        Args:
+            db (Database): The database to load the movies into.
+            checkpoint_path (str): The JSON file recording completed pages.
+            requests_per_second (float, optional): The TMDb request rate limit. Defaults to 40.
+            workers (int, optional): Number of pages fetched at the same time. Defaults to 8.
+            batch_pages (int, optional): Number of pages stored per batch. Defaults to 10.
+        """
+        self.db = db
+        self.checkpoint_path = checkpoint_path
+        self.bucket = TokenBucket(requests_per_second)
+        self.workers = workers
+        self.batch_pages = batch_pages
+        self.completed = self.__load_checkpoint()
+
+    def __load_checkpoint(self):
+        """
+        Read the pages completed by earlier runs.
+
+        Returns:
+            set: The numbers of the completed pages.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, 'r') as file:
+            return set(json.load(file).get('completed', []))
+
+    def __save_checkpoint(self):
+        """Write the completed pages atomically so a crash never leaves a broken checkpoint."""
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({'completed': sorted(self.completed)}, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def __fetch_page(self, page):
+        """
+        Fetch one discover page once the rate limit allows it.
+
+        Args:
+            page (int): The page number.
+
+        Returns:
+            tuple: The page number and its movies, or None if the request failed.
+        """
+        self.bucket.acquire()
+        return page, api.fetch_movies(page)
+
+    def __store_batch(self, pages):
+        """
+        Store the movies of a batch of fetched pages.
+
+        Args:
+            pages (dict): Mapping of page numbers to their movies.
+
+        Returns:
+            int: The number of newly stored movies.
+        """
+        movies = [movie for page_movies in pages.values() for movie in page_movies]
+        page_by_movie = {movie["id"]: page for page, page_movies in pages.items() for movie in page_movies}
+
+        genres = self.db.get_genres(genre for movie in movies for genre in movie["genre_ids"])
+
+        rows = []
+        for movie, picture in self.db.fetch_posters(movies):
+            rows.append((movie, page_by_movie[movie["id"]], self.db.posters.put(picture)))
+
+        stored = self.db.add_movies(rows, genres)
+        self.db.add_movie_genre_relation(movies, genres)
+        return stored
+
+    def run(self, first_page, last_page, progress=None):
+        """
+        Sync all pages between first_page and last_page that are not completed yet.
+
+        Args:
+            first_page (int): The first page to sync.
+            last_page (int): The last page to sync (inclusive).
+            progress (callable, optional): Called with (completed_pages, total_pages, stored_movies)
+                after every batch.
+
+        Returns:
+            int: The number of newly stored movies.
+        """
+        pending = [page for page in range(first_page, last_page + 1) if page not in self.completed]
+        total = last_page - first_page + 1
+        stored = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(pending), self.batch_pages):
+                batch = pending[start:start + self.batch_pages]
+                pages = {
+                    page: movies
+                    for page, movies in executor.map(self.__fetch_page, batch)
+                    if movies is not None
+                }
+                if pages:
+                    stored += self.__store_batch(pages)
+                self.completed.update(pages)
+                self.__save_checkpoint()
+                if progress is not None:
+                    done = len([page for page in range(first_page, last_page + 1) if page in self.completed])
+                    progress(done, total, stored)
+
+        return stored
@@ -0,0 +1,161 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from base import get_app_config
+
+
+class ChangeSignals(QObject):
+    """Signals emitted by a ChangeWorker."""
+    polled = Signal(object)
+    failed = Signal()
+
+
+class ChangeWorker(QRunnable):
+    """A background task that reads a user's changes since the last poll."""
+
+    def __init__(self, db, user_id, event_id, match_id):
+        """
+        Initialize the ChangeWorker.
+
+        Args:
+            db (Database): The database to query.
+            user_id (int): The ID of the logged-in user.
+            event_id (int): The highest connection event ID already seen.
+            match_id (int): The highest match ID already seen.
+        """
+        super().__init__()
+        self.signals = ChangeSignals()
+        self.db = db
+        self.user_id = user_id
+        self.event_id = event_id
+        self.match_id = match_id
+
+    def run(self):
+        """Query the changes off the UI thread."""
+        try:
+            changes = self.db.get_changes(self.user_id, self.event_id, self.match_id)
+        except Exception:
+            self.signals.failed.emit()
+            return
+        self.signals.polled.emit(changes)
+
+
+class ChangeFeed(QObject):
+    """
+    Polls the database for new connection requests, accepted connections and matches.
+
+    Only rows created after the last poll are read, tracked by high-water marks
+    on connection_events and matches. Row IDs are taken at insert time but can
+    commit in another order, so every poll reads the last `window` IDs below
+    the marks again and only emits what was not delivered yet. Non-empty
+    changes are emitted as deltas: `requests_added` and `connections_accepted`
+    with {connection ID: email}, `matches_added` with {connection ID: [movie IDs]}.
+    """
+    # object instead of dict, Qt would turn the integer keys into strings
+    requests_added = Signal(object)
+    connections_accepted = Signal(object)
+    matches_added = Signal(object)
+
+    def __init__(self, db, parent=None):
+        """
+        Initialize the ChangeFeed with the 'Changes' settings.
+
+        Args:
+            db (Database): The database to poll.
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        config = get_app_config().get('Changes', {})
+        self.db = db
+        self.user_id = None
+        self.event_id = 0
+        self.match_id = 0
+        # The window must stay below the limit of Database.get_changes, or a poll could not advance
+        self.window = config.get('Window', 50)
+        self.first_event_id = 0
+        self.first_match_id = 0
+        self.delivered = set()
+        self.in_flight = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(config.get('PollInterval', 5.0) * 1000))
+        self.timer.timeout.connect(self.poll)
+
+    def start(self, user_id):
+        """
+        Start polling for a user.
+
+        The high-water marks are taken before the caller loads the full lists,
+        so changes made in between are delivered by the first poll. Rows below
+        these first marks are in the lists and are not read again.
+
+        Args:
+            user_id (int): The ID of the logged-in user.
+        """
+        self.user_id = user_id
+        self.event_id, self.match_id = self.db.get_change_marks()
+        self.first_event_id, self.first_match_id = self.event_id, self.match_id
+        self.delivered = set()
+        self.timer.start()
+
+    def stop(self):
+        """Stop polling."""
+        self.timer.stop()
+        self.user_id = None
+
+    def poll(self):
+        """Start reading the changes unless a poll is already running."""
+        if self.in_flight or self.user_id is None:
+            return
+        self.in_flight = True
+        worker = ChangeWorker(
+            self.db, self.user_id,
+            max(self.event_id - self.window, self.first_event_id),
+            max(self.match_id - self.window, self.first_match_id)
+        )
+        worker.signals.polled.connect(self.__on_polled)
+        worker.signals.failed.connect(self.__on_failed)
+        self.pool.start(worker)
+
+    def __on_polled(self, changes):
+        """Advance the high-water marks and emit the changes that were not delivered yet."""
+        self.in_flight = False
+        if self.user_id is None:
+            return
+        self.event_id = max(self.event_id, changes['event_id'])
+        self.match_id = max(self.match_id, changes['match_id'])
+        requests = self.__undelivered('request', changes['requests'])
+        accepted = self.__undelivered('accepted', changes['accepted'])
+        matches = {}
+        for connection_id, movie_ids in changes['matches'].items():
+            movie_ids = [movie_id for movie_id in movie_ids if ('match', connection_id, movie_id) not in self.delivered]
+            if movie_ids:
+                matches[connection_id] = movie_ids
+                self.delivered.update(('match', connection_id, movie_id) for movie_id in movie_ids)
+        if requests:
+            self.requests_added.emit(requests)
+        if accepted:
+            self.connections_accepted.emit(accepted)
+        if matches:
+            self.matches_added.emit(matches)
+
+    def __undelivered(self, kind, connections):
+        """
+        Keep the connection changes of a kind that were not emitted yet and mark them as delivered.
+
+        Args:
+            kind (str): 'request' or 'accepted'.
+            connections (dict): Dictionary of connection IDs and emails.
+
+        Returns:
+            dict: The connections not delivered before.
+        """
+        connections = {
+            connection_id: email for connection_id, email in connections.items()
+            if (kind, connection_id) not in self.delivered
+        }
+        self.delivered.update((kind, connection_id) for connection_id in connections)
+        return connections
+
+    def __on_failed(self):
+        """Keep the marks and try again on the next tick."""
+        self.in_flight = False
@@ -0,0 +1,261 @@
+import requests
+from requests.adapters import HTTPAdapter
+from base import get_db_config, get_app_config
+from swipe_buffer import SwipeBuffer
+
+
+def movies_by_id(movies):
+    """Convert the JSON object keys of a movie dictionary back to movie IDs."""
+    if movies is None:
+        return None
+    return {int(movie_id): movie for movie_id, movie in movies.items()}
+
+
+class RemoteDatabase:
+    """
+    A thin client for SwipeService with the interface of Database.
+
+    Requests share one keep-alive session and carry the token of the last
+    successful login. Swipes are collected in a local SwipeBuffer and sent in
+    batches, the service then writes them together with the swipes of other
+    clients.
+    """
+
+    def __init__(self, url, timeout=10):
+        """
+        Initialize the RemoteDatabase.
+
+        Args:
+            url (str): The base URL of the service, e.g. 'http://127.0.0.1:8080'.
+            timeout (float, optional): Seconds to wait for a response. Defaults to 10.
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+        self.user_id = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        swipe_config = get_app_config().get('Swipes', {})
+        self.swipes = SwipeBuffer(
+            self.__send_user_interests,
+            swipe_config.get('BatchSize', 20),
+            swipe_config.get('FlushInterval', 2.0)
+        )
+
+    def __request(self, method, path, **kwargs):
+        """
+        Send a request to the service.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path below the base URL.
+            **kwargs: Passed on to requests, e.g. params or json.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            requests.RequestException: If the service cannot be reached or answers with an error.
+        """
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        response = self.session.request(
+            method, f"{self.url}{path}", headers=headers, timeout=self.timeout, **kwargs
+        )
+        response.raise_for_status()
+        return response
+
+    def __get(self, path, **params):
+        """Send a GET request and return the decoded JSON body."""
+        return self.__request('GET', path, params=params).json()
+
+    def __post(self, path, body):
+        """Send a POST request with a JSON body and return the decoded JSON body."""
+        return self.__request('POST', path, json=body).json()
+
+    def ping(self):
+        """Check that the service is reachable."""
+        self.__get('/ping')
+
+    def close(self):
+        """Send pending swipes and close the HTTP session."""
+        self.swipes.close()
+        self.session.close()
+
+    def try_login(self, email, password):
+        """
+        Log in and keep the session token for the following requests.
+
+        Returns:
+            int: The user's ID if login is successful, -1 otherwise.
+        """
+        result = self.__post('/login', {'email': email, 'password': password})
+        if result['user_id'] != -1:
+            self.token = result['token']
+            self.user_id = result['user_id']
+        return result['user_id']
+
+    def sign_up(self, email, password):
+        """See Database.sign_up."""
+        return self.__post('/signup', {'email': email, 'password': password})['ok']
+
+    def create_connection_request(self, userid1, email_receiver):
+        """See Database.create_connection_request."""
+        return self.__post('/connections', {'user_id': userid1, 'email': email_receiver})['ok']
+
+    def get_users_connections(self, user_id, pending=False, after_connection_id=0, limit=None):
+        """See Database.get_users_connections."""
+        params = {'user_id': user_id, 'pending': int(pending), 'after': after_connection_id}
+        if limit is not None:
+            params['limit'] = limit
+        connections = self.__get('/connections', **params)
+        return {int(connection_id): email for connection_id, email in connections.items()}
+
+    def get_users_connections_page(self, user_id, pending=False, page_token=None, limit=50):
+        """See Database.get_users_connections_page."""
+        params = {'user_id': user_id, 'pending': int(pending), 'limit': limit}
+        if page_token:
+            params['token'] = page_token
+        page = self.__get('/connections/page', **params)
+        return {int(connection_id): email for connection_id, email in page['connections'].items()}, page['next']
+
+    def iter_users_connections(self, user_id, pending=False, after_connection_id=0, batch_size=500):
+        """See Database.iter_users_connections; reads the connections page by page."""
+        while True:
+            connections = self.get_users_connections(user_id, pending, after_connection_id, batch_size)
+            yield from connections.items()
+            if len(connections) < batch_size:
+                return
+            after_connection_id = next(reversed(connections))
+
+    def accept_connection(self, connection_id):
+        """See Database.accept_connection; only the logged-in receiver can accept."""
+        self.flush_user_interests()
+        return self.__post(f'/connections/{connection_id}/accept', {'user_id': self.user_id})['ok']
+
+    def get_other_user_from_connection(self, user_id, connection_id):
+        """See Database.get_other_user_from_connection."""
+        return self.__get(f'/connections/{connection_id}/other', user_id=user_id)['user_id']
+
+    def get_change_marks(self):
+        """See Database.get_change_marks."""
+        marks = self.__get('/changes/marks')
+        return marks['event_id'], marks['match_id']
+
+    def get_changes(self, user_id, after_event_id, after_match_id):
+        """See Database.get_changes."""
+        changes = self.__get('/changes', user_id=user_id, after_event=after_event_id, after_match=after_match_id)
+        for key in ('requests', 'accepted', 'matches'):
+            changes[key] = {int(connection_id): value for connection_id, value in changes[key].items()}
+        return changes
+
+    def get_movies_for_user(self, user_id, recursive=False, after_movie_id=0, limit=8):
+        """See Database.get_movies_for_user."""
+        self.flush_user_interests()
+        return movies_by_id(self.__get('/deck', user_id=user_id, after=after_movie_id, limit=limit))
+
+    def add_user_interest(self, user_id, movie_id, is_liked):
+        """See Database.add_user_interest."""
+        self.swipes.add(user_id, movie_id, is_liked)
+        return True
+
+    def flush_user_interests(self, user_id=None):
+        """See Database.flush_user_interests; sends the queued swipes to the service."""
+        self.swipes.flush(user_id)
+
+    def __send_user_interests(self, interests):
+        """
+        Send a batch of swipes, one request per user.
+
+        Args:
+            interests (list): List of (user_id, movie_id, is_liked) tuples.
+        """
+        by_user = {}
+        for user_id, movie_id, is_liked in interests:
+            by_user.setdefault(user_id, []).append([movie_id, is_liked])
+        for user_id, swipes in by_user.items():
+            self.__post('/swipes', {'user_id': user_id, 'swipes': swipes})
+
+    def get_user_matches(self, user1, connection_id, movie_id=0, limit=20):
+        """See Database.get_user_matches."""
+        self.flush_user_interests()
+        return movies_by_id(self.__get(
+            f'/connections/{connection_id}/matches', user_id=user1, after=movie_id, limit=limit
+        ))
+
+    def get_user_matches_page(self, user1, connection_id, page_token=None, limit=20):
+        """See Database.get_user_matches_page."""
+        self.flush_user_interests()
+        params = {'user_id': user1, 'limit': limit}
+        if page_token:
+            params['token'] = page_token
+        page = self.__get(f'/connections/{connection_id}/matches/page', **params)
+        return movies_by_id(page['movies']), page['next']
+
+    def iter_user_matches(self, user1, connection_id, movie_id=0, batch_size=500):
+        """See Database.iter_user_matches; reads the matches page by page."""
+        while True:
+            movies = self.get_user_matches(user1, connection_id, movie_id, batch_size) or {}
+            yield from movies.items()
+            if len(movies) < batch_size:
+                return
+            movie_id = next(reversed(movies))
+
+    def create_group(self, owner_id, name):
+        """See Database.create_group."""
+        return self.__post('/groups', {'user_id': owner_id, 'name': name})['group_id']
+
+    def add_group_member(self, user_id, group_id, email):
+        """See Database.add_group_member."""
+        return self.__post(f'/groups/{group_id}/members', {'user_id': user_id, 'email': email})['ok']
+
+    def get_user_groups(self, user_id):
+        """See Database.get_user_groups."""
+        groups = self.__get('/groups', user_id=user_id)
+        return {int(group_id): name for group_id, name in groups.items()}
+
+    def get_group_matches(self, user_id, group_id, min_likes=None, movie_id=0, limit=20):
+        """See Database.get_group_matches."""
+        self.flush_user_interests()
+        params = {'user_id': user_id, 'after': movie_id, 'limit': limit}
+        if min_likes is not None:
+            params['min_likes'] = min_likes
+        return movies_by_id(self.__get(f'/groups/{group_id}/matches', **params))
+
+    def get_poster(self, poster, poster_path=None, size=None):
+        """See Database.get_poster."""
+        if poster is None:
+            return None
+        params = {}
+        if poster_path:
+            params['path'] = poster_path
+        if size:
+            params['size'] = size
+        try:
+            return self.__request('GET', f'/posters/{poster}', params=params).content
+        except requests.HTTPError as error:
+            if error.response.status_code == 404:
+                return None
+            raise
+
+
+def open_database(config=None):
+    """
+    Open the database selected by dbconfig.json.
+
+    If 'ServiceUrl' is set the client talks to the SwipeService at that URL,
+    otherwise the database is opened directly with the configured backend.
+
+    Args:
+        config (dict, optional): Database settings to use instead of dbconfig.json.
+
+    Returns:
+        Database or RemoteDatabase: The opened database.
+    """
+    config = get_db_config() if config is None else config
+    if config.get('ServiceUrl'):
+        return RemoteDatabase(config['ServiceUrl'], config.get('ServiceTimeout', 10))
+
+    from database import Database
+    return Database(config)
@@ -0,0 +1,175 @@
+from bisect import bisect_left
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from base import get_app_config
+
+
+class ConnectionListModel(QAbstractListModel):
+    """
+    A list model of connections that loads pages from the database as the view scrolls.
+
+    Rows are kept sorted by connection ID, the order pages are read in, so a
+    connection's row is found by binary search and rows never change identity.
+    Changes from the change feed are applied as single row inserts, removals
+    and updates instead of reloading the list, and the view only asks for the
+    rows it shows.
+
+    The display text is the other user's email and the number of matches that
+    arrived since the connection was last viewed; the connection ID is
+    available as Qt.UserRole. Matches are counted by movie, so a match the
+    change feed reports again, e.g. after rebuild-matches, is not new.
+    """
+
+    def __init__(self, fetch_page, parent=None):
+        """
+        Initialize the ConnectionListModel with the 'Lists' settings.
+
+        Args:
+            fetch_page (callable): Called with (page_token, limit), returns {connection ID: email}
+                ordered by connection ID and the token of the next page, or None after the last page.
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.page_size = get_app_config().get('Lists', {}).get('PageSize', 50)
+        self.ids = []
+        self.emails = {}
+        self.matches = {}
+        self.new_matches = {}
+        self.next_token = None
+        self.exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        """Return the number of loaded rows."""
+        return 0 if parent.isValid() else len(self.ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Return the text or the connection ID of a row."""
+        if not index.isValid() or index.row() >= len(self.ids):
+            return None
+        connection_id = self.ids[index.row()]
+        if role == Qt.DisplayRole:
+            email = self.emails[connection_id]
+            new = len(self.new_matches.get(connection_id, ()))
+            return f"{email} ({new} new matches)" if new else email
+        if role == Qt.UserRole:
+            return connection_id
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """Return whether more pages can be read."""
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Read the page after the last loaded connection and append it."""
+        if parent.isValid() or self.exhausted:
+            return
+        page, self.next_token = self.fetch_page(self.next_token, self.page_size)
+        if self.next_token is None:
+            self.exhausted = True
+        # Connections added by the change feed in the meantime are skipped
+        page = {connection_id: email for connection_id, email in page.items() if connection_id not in self.emails}
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.ids), len(self.ids) + len(page) - 1)
+        self.ids += page.keys()
+        self.emails.update(page)
+        self.endInsertRows()
+
+    def reset(self):
+        """Drop all rows, the view reads the first page again."""
+        self.beginResetModel()
+        self.ids = []
+        self.emails = {}
+        self.matches = {}
+        self.new_matches = {}
+        self.next_token = None
+        self.exhausted = False
+        self.endResetModel()
+
+    def row(self, connection_id):
+        """
+        Return the row of a connection.
+
+        Args:
+            connection_id (int): The ID of the connection.
+
+        Returns:
+            int: The row, or -1 if the connection is not loaded.
+        """
+        row = bisect_left(self.ids, connection_id)
+        return row if row < len(self.ids) and self.ids[row] == connection_id else -1
+
+    def connection_id(self, index):
+        """Return the connection ID of a model index."""
+        return self.ids[index.row()]
+
+    def add(self, connections):
+        """
+        Insert connections at their position in the ID order.
+
+        Connections after the last loaded page are left to fetchMore, so every
+        page read afterwards still follows the loaded rows.
+
+        Args:
+            connections (dict): Dictionary of connection IDs and emails.
+        """
+        for connection_id, email in sorted(connections.items()):
+            if connection_id in self.emails:
+                continue
+            if not self.exhausted and (not self.ids or connection_id > self.ids[-1]):
+                continue
+            row = bisect_left(self.ids, connection_id)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.ids.insert(row, connection_id)
+            self.emails[connection_id] = email
+            self.endInsertRows()
+
+    def remove(self, connection_id):
+        """
+        Remove a connection if it is loaded.
+
+        Args:
+            connection_id (int): The ID of the connection.
+        """
+        row = self.row(connection_id)
+        if row == -1:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.ids[row]
+        del self.emails[connection_id]
+        self.matches.pop(connection_id, None)
+        self.new_matches.pop(connection_id, None)
+        self.endRemoveRows()
+
+    def add_new_matches(self, connection_id, movie_ids):
+        """
+        Add matches to the new matches shown for a connection.
+
+        Args:
+            connection_id (int): The ID of the connection.
+            movie_ids (list): The IDs of the matched movies that arrived.
+        """
+        known = self.matches.setdefault(connection_id, set())
+        movie_ids = set(movie_ids) - known
+        if not movie_ids:
+            return
+        known |= movie_ids
+        self.new_matches.setdefault(connection_id, set()).update(movie_ids)
+        self.__changed(connection_id)
+
+    def clear_new_matches(self, connection_id):
+        """
+        Reset the number of new matches of a connection after it has been viewed.
+
+        Args:
+            connection_id (int): The ID of the connection.
+        """
+        if self.new_matches.pop(connection_id, None) is not None:
+            self.__changed(connection_id)
+
+    def __changed(self, connection_id):
+        """Let the view repaint the row of a connection."""
+        row = self.row(connection_id)
+        if row != -1:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
@@ -1,8 +1,60 @@
-import mysql.connector
-from base import get_db_config
-from api import ApiWrapper
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from base import get_db_config, get_app_config
+from api import LazyApiWrapper
+from poster_store import PosterStore
+from pool import ConnectionPool
+from backends import create_backend
+from swipe_buffer import SwipeBuffer
+from group_matching import LikedSets, match_group, bitset_ids
+from genre_catalog import GenreCatalog
+from ranking import DeckRanker
+from metrics import metrics
+from paging import encode_token, decode_token
+
+logger = logging.getLogger('movietinder.database')
+
+# Created on first use, see LazyApiWrapper
+api = LazyApiWrapper()
+
+# Matches of a connection from a movie ID on, seeking on the (connection, movie) unique key
+USER_MATCHES_SQL = """
+    SELECT 
+        md.id, 
+        md.title, 
+        md.release_date, 
+        md.poster, 
+        md.genres,
+        md.poster_path
+    FROM 
+        matches mt
+    JOIN 
+        connections c ON c.id = mt.connection
+    JOIN 
+        movies md ON mt.movie = md.id
+    WHERE 
+        mt.connection = %s
+        AND (c.user1 = %s OR c.user2 = %s)
+        AND mt.movie > %s
+    ORDER BY 
+        mt.movie
+"""
+
+
+def genre_bit(genre_id):
+    """
+    Return the bit representing a genre in movies.genre_mask.
+
+    Args:
+        genre_id (int): The ID of the genre in the movie_genres table.
 
-api = ApiWrapper()
+    Returns:
+        int: The genre's bit, or 0 for IDs that do not fit into the 64-bit mask.
+    """
+    if not 1 <= genre_id <= 64:
+        return 0
+    return 1 << (genre_id - 1)
 
 
 class Database:
@@ -10,25 +62,128 @@ class Database:
     A class to represent the database operations.
     """
 
-    def __init__(self):
+    def __init__(self, config=None):
         """
-        Initialize the Database instance and open a connection.
+        Initialize the Database instance, its storage backend and connection pool.
+
+        The backend is selected by the 'Backend' setting in dbconfig.json
+        ('mysql' or 'sqlite'). Connections are opened lazily, so the pool holds
+        no connection until the first query.
+
+        Args:
+            config (dict, optional): Database settings to use instead of dbconfig.json.
         """
-        self.connection = None
-        self.__open_connection()
+        data = get_db_config() if config is None else config
+        self.backend = create_backend(data)
+        self.pool = ConnectionPool(
+            self.backend.connect,
+            self.backend.check,
+            data.get('PoolSize', 5),
+            data.get('PoolTimeout', 30)
+        )
+        poster_config = get_app_config().get('Posters', {})
+        self.poster_workers = poster_config.get('Workers', 8)
+        self.poster_timeout = poster_config.get('Timeout', 10)
+        self.poster_ingest_size = poster_config.get('IngestSize', 'w185')
+        self.posters = PosterStore()
+        swipe_config = get_app_config().get('Swipes', {})
+        self.swipes = SwipeBuffer(
+            self.__insert_user_interests,
+            swipe_config.get('BatchSize', 20),
+            swipe_config.get('FlushInterval', 2.0)
+        )
+        self.liked_sets = LikedSets(self)
+        self.genre_catalog = GenreCatalog(self, get_app_config().get('Genres', {}).get('TTL', 86400))
+        ranking_config = get_app_config().get('Ranking', {})
+        self.ranker = None
+        if ranking_config.get('Enabled', True):
+            self.ranker = DeckRanker(
+                self,
+                ranking_config.get('RerankEvery', 8),
+                ranking_config.get('DislikeWeight', 0.5),
+                ranking_config.get('FriendSlots', 4),
+                ranking_config.get('QueueSize', 64),
+                ranking_config.get('MaxUsers', 1000)
+            )
+
+    @contextmanager
+    def cursor(self):
+        """
+        Check out a pooled connection and open a cursor on it.
 
-    def __open_connection(self):
+        The cursor is closed and the connection returned to the pool when the
+        with block ends. Statements are committed individually (autocommit).
+
+        Yields:
+            A cursor of the storage backend.
         """
-        Open a connection to the database using configuration from a JSON file.
+        with self.pool.connection() as connection:
+            cursor = metrics.wrap_cursor(self.backend.cursor(connection))
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self):
         """
-        data = get_db_config()
-        self.connection = mysql.connector.connect(
-            host=data['Host'],
-            user=data['Username'],
-            password=data['Password'],
-            database=data['Database'],
-            autocommit=True
-        )
+        Check out a pooled connection and run the with block in one transaction.
+
+        The transaction is committed if the block succeeds and rolled back otherwise.
+
+        Yields:
+            A cursor of the storage backend.
+        """
+        with self.pool.connection() as connection:
+            self.backend.begin(connection)
+            cursor = metrics.wrap_cursor(self.backend.cursor(connection))
+            try:
+                yield cursor
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def stream(self, sql_command, params=(), batch_size=500):
+        """
+        Run a query on a streaming cursor and yield its rows.
+
+        The rows are read from the server in batches of batch_size instead of
+        all at once, so large results are never held in memory. The pooled
+        connection stays checked out until the generator is exhausted or closed.
+
+        Args:
+            sql_command (str): The query.
+            params (tuple, optional): The query parameters.
+            batch_size (int, optional): The number of rows fetched at a time. Defaults to 500.
+
+        Yields:
+            tuple: The rows of the result.
+        """
+        with self.pool.connection() as connection:
+            cursor = metrics.wrap_cursor(self.backend.stream_cursor(connection))
+            try:
+                cursor.execute(sql_command, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def ping(self):
+        """Open a pooled connection and check that the database answers."""
+        with self.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+
+    def close(self):
+        """Write pending swipes and close all idle pooled connections."""
+        self.swipes.close()
+        self.pool.close()
 
     def __save(self, table, columns, values, row_id_to_update=-1):
         """
@@ -64,9 +219,8 @@ class Database:
         set_columns = ', '.join([f"{columns[i]} = %s" for i in range(len(columns))])
         sql_command = f'UPDATE {table} SET {set_columns} WHERE id = %s'
 
-        cur = self.connection.cursor()
-        cur.execute(sql_command, values + [row_id])
-        # self.connection.commit()
+        with self.cursor() as cur:
+            cur.execute(sql_command, values + [row_id])
         return True
 
     def __insert(self, table, columns, values):
@@ -85,14 +239,14 @@ class Database:
         placeholders = ', '.join(['%s'] * len(values))
         sql_command = f'INSERT INTO {table} ({columns_string}) VALUES ({placeholders})'
 
-        cur = self.connection.cursor()
-        try:
-            cur.execute(sql_command, values)
-        except mysql.connector.errors.IntegrityError:
-            return False
-        # self.connection.commit()
+        with self.cursor() as cur:
+            try:
+                cur.execute(sql_command, values)
+            except self.backend.IntegrityError:
+                return False
         return True
 
+    @metrics.timed('database')
     def try_login(self, email, password):
         """
         Attempt to log in a user by verifying the email and password.
@@ -106,14 +260,15 @@ class Database:
         """
         sql_command = "SELECT id, password FROM users WHERE email = %s"
 
-        cur = self.connection.cursor()
-        cur.execute(sql_command, (email,))
-        res = cur.fetchone()
+        with self.cursor() as cur:
+            cur.execute(sql_command, (email,))
+            res = cur.fetchone()
 
         if res is not None and res[1] == password:
             return res[0]
         return -1
 
+    @metrics.timed('database')
     def sign_up(self, email, password):
         """
         Sign up a new user by inserting their email and hashed password into the database.
@@ -127,6 +282,7 @@ class Database:
         """
         return self.__insert('users', ['email', 'password'], [email, password])
 
+    @metrics.timed('database')
     def is_connection_in_usage(self, id_sender, id_receiver):
         """
         Check if a connection between the sender and receiver already exists.
@@ -143,11 +299,12 @@ class Database:
             FROM connections 
             WHERE (user1=%s AND user2=%s) OR (user1=%s AND user2=%s)
         """
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (id_sender, id_receiver, id_receiver, id_sender))
-        result = cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, (id_sender, id_receiver, id_receiver, id_sender))
+            result = cursor.fetchone()
         return result is not None
 
+    @metrics.timed('database')
     def create_connection_request(self, userid1, email_receiver):
         """
         Create a connection request from userid1 to the user with email_receiver.
@@ -161,9 +318,9 @@ class Database:
         """
         # Retrieve the ID of the receiver based on their email
         sql_command = "SELECT id FROM users WHERE email = %s"
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (email_receiver,))
-        result = cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, (email_receiver,))
+            result = cursor.fetchone()
 
         if result is None or result[0] == userid1:
             return False
@@ -172,31 +329,73 @@ class Database:
         if self.is_connection_in_usage(userid1, result[0]):
             return False
 
-        # Save the new connection request
-        return self.__save('connections', ['user1', 'user2'], [userid1, result[0]])
+        # Save the new connection request and announce it to the receiver's change feed
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO connections (user1, user2) VALUES (%s, %s)", (userid1, result[0]))
+            cursor.execute(
+                "INSERT INTO connection_events (connection, user, kind) VALUES (%s, %s, 'request')",
+                (cursor.lastrowid, result[0])
+            )
+        return True
 
-    def get_users_connections(self, user_id, pending=False):
+    @metrics.timed('database')
+    def get_users_connections(self, user_id, pending=False, after_connection_id=0, limit=None):
         """
-        Retrieve all connections for a user.
+        Retrieve the connections of a user, ordered by connection ID.
+
+        Pending connections are the requests the user has received. Active
+        connections are listed for both users, so they include the requests
+        the user sent as well as the ones they received. A page is read with
+        one index seek per side of the connection, so it takes the same time
+        however many connections come before it.
 
         Args:
             user_id (int): The ID of the user.
             pending (bool): Whether to retrieve pending connections. Defaults to False.
+            after_connection_id (int, optional): Only return connections with a higher ID. Defaults to 0.
+            limit (int, optional): The maximum number of connections to return. Defaults to all.
 
         Returns:
-            dict: A dictionary of connection IDs and user emails for the connections.
+            dict: A dictionary of connection IDs and the other users' emails.
         """
-        sql_command = """
-            SELECT 
-                connections.id AS connectionid, 
-                users.email AS usermail 
-            FROM connections 
-            JOIN users ON connections.user1 = users.id 
-            WHERE connections.user2 = %s AND active = %s
+        if limit is None:
+            return dict(self.iter_users_connections(user_id, pending, after_connection_id))
+
+        # Each side is a keyset seek on (user, active, id), the merged result is cut to the page
+        sql_side = """
+            SELECT * FROM (
+                SELECT 
+                    c.id AS connectionid, 
+                    u.email AS usermail 
+                FROM 
+                    connections c
+                JOIN 
+                    users u ON u.id = c.{other}
+                WHERE 
+                    c.{own} = %s
+                    AND c.active = %s
+                    AND c.id > %s
+                ORDER BY 
+                    c.id
+                LIMIT %s
+            ) {name}
         """
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (user_id, not pending,))
-        result = cursor.fetchall()
+        sides = [sql_side.format(own='user2', other='user1', name='received')]
+        if not pending:
+            # Requests the user sent are not pending for them, only the accepted ones are listed
+            sides.append(sql_side.format(own='user1', other='user2', name='sent'))
+        sql_command = f"""
+            SELECT connectionid, usermail FROM (
+                {'UNION ALL'.join(sides)}
+            ) page
+            ORDER BY 
+                connectionid
+            LIMIT %s
+        """
+        params = [user_id, not pending, after_connection_id, limit] * len(sides) + [limit]
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, params)
+            result = cursor.fetchall()
 
         if not result:
             return {}
@@ -205,6 +404,68 @@ class Database:
         connections = {row[0]: row[1] for row in result}
         return connections
 
+    def get_users_connections_page(self, user_id, pending=False, page_token=None, limit=50):
+        """
+        Retrieve one page of a user's connections, see get_users_connections.
+
+        Args:
+            user_id (int): The ID of the user.
+            pending (bool): Whether to retrieve pending connections. Defaults to False.
+            page_token (str, optional): The token returned with the previous page. Defaults to the first page.
+            limit (int, optional): The maximum number of connections to return. Defaults to 50.
+
+        Returns:
+            tuple: A dictionary of connection IDs and emails, and the token of the
+                next page or None if this is the last page.
+
+        Raises:
+            ValueError: If the page token is invalid.
+        """
+        after_connection_id = decode_token('connections', page_token, 1)[0] if page_token else 0
+        # One extra row tells whether another page follows
+        connections = self.get_users_connections(user_id, pending, after_connection_id, limit + 1)
+        if len(connections) <= limit:
+            return connections, None
+        connections = dict(list(connections.items())[:limit])
+        return connections, encode_token('connections', [next(reversed(connections))])
+
+    def iter_users_connections(self, user_id, pending=False, after_connection_id=0, batch_size=500):
+        """
+        Stream all connections of a user, ordered by connection ID, see get_users_connections.
+
+        Args:
+            user_id (int): The ID of the user.
+            pending (bool): Whether to retrieve pending connections. Defaults to False.
+            after_connection_id (int, optional): Only return connections with a higher ID. Defaults to 0.
+            batch_size (int, optional): The number of rows fetched at a time. Defaults to 500.
+
+        Yields:
+            tuple: The connection ID and the other user's email.
+        """
+        sql_command = """
+            SELECT 
+                c.id AS connectionid, 
+                u.email AS usermail 
+            FROM 
+                connections c
+            JOIN 
+                users u ON u.id = CASE WHEN c.user1 = %s THEN c.user2 ELSE c.user1 END
+            WHERE 
+                {}
+                AND c.id > %s
+            ORDER BY 
+                c.id
+        """
+        if pending:
+            sql_command = sql_command.format("c.user2 = %s AND c.active = 0")
+            params = (user_id, user_id, after_connection_id)
+        else:
+            sql_command = sql_command.format("(c.user1 = %s OR c.user2 = %s) AND c.active = 1")
+            params = (user_id, user_id, user_id, after_connection_id)
+        for connection_id, email in self.stream(sql_command, params, batch_size):
+            yield connection_id, email
+
+    @metrics.timed('database')
     def accept_connection(self, connection_id):
         """
         Accept a connection request.
@@ -215,79 +476,328 @@ class Database:
         Returns:
             bool: True if the connection was successfully accepted, False otherwise.
         """
-        return self.__save('connections', ['active'], [True], connection_id)
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE connections SET active = 1 WHERE id = %s", (connection_id,))
+            # Both users get the connection in their change feed
+            cursor.execute("""
+                INSERT INTO connection_events (connection, user, kind)
+                SELECT id, user1, 'accepted' FROM connections WHERE id = %s
+                UNION ALL
+                SELECT id, user2, 'accepted' FROM connections WHERE id = %s
+            """, (connection_id, connection_id))
+        # Movies both users liked before the connection was accepted are matches as well;
+        # swipes still queued are matched when they are written, as the connection is active now
+        self.rebuild_matches(connection_id)
+        self.rebuild_friend_pending(connection_id)
+        return True
 
-    def add_movie_genre_relation(self, movies, last_row_id, row_count):
+    @metrics.timed('database')
+    def get_change_marks(self):
         """
-        Add the relationship between movies and genres in the movie_x_genres table.
+        Return the current high-water marks of the change feed, see get_changes.
+
+        Returns:
+            tuple: The highest connection event ID and the highest match ID.
+        """
+        with self.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM connection_events")
+            event_id = cursor.fetchone()[0]
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM matches")
+            match_id = cursor.fetchone()[0]
+        return event_id, match_id
+
+    @metrics.timed('database')
+    def get_changes(self, user_id, after_event_id, after_match_id, limit=100):
+        """
+        Return the connection requests, accepted connections and matches of a user
+        created after the given high-water marks.
+
+        Connection changes are read from connection_events, matches by their row ID.
+        Rebuilding the matches table gives existing matches new IDs, so they can
+        show up again; callers should apply changes idempotently. Rows can commit
+        after rows with higher IDs, so callers read again a window of IDs below
+        their marks, see ChangeFeed.
 
         Args:
-            movies (list): List of movies fetched from the API.
-            last_row_id (int): The ID of the last inserted movie in the movies table.
+            user_id (int): The ID of the user.
+            after_event_id (int): The highest connection event ID already seen.
+            after_match_id (int): The highest match ID already seen.
+            limit (int, optional): The maximum number of events and of matches returned. Defaults to 100.
 
         Returns:
-            bool: True if the relationships were successfully added, False otherwise.
+            dict: 'requests' and 'accepted' map connection IDs to the other user's email,
+                'matches' maps connection IDs to lists of movie IDs, and 'event_id' and
+                'match_id' are the new high-water marks.
         """
-        api_genres = []
-        for movie in movies:
-            api_genres += movie["genre_ids"]
+        self.flush_user_interests(user_id)
 
-        # Fetch genre IDs from the database
-        sql_command = f"""
-            SELECT api_id, id 
-            FROM movie_genres 
-            WHERE api_id IN ({', '.join(['%s'] * len(api_genres))})
+        sql_events = """
+            SELECT 
+                e.id, 
+                e.kind, 
+                e.connection, 
+                u.email
+            FROM 
+                connection_events e
+            JOIN 
+                connections c ON c.id = e.connection
+            JOIN 
+                users u ON u.id = CASE WHEN c.user1 = e.user THEN c.user2 ELSE c.user1 END
+            WHERE 
+                e.user = %s
+                AND e.id > %s
+            ORDER BY 
+                e.id
+            LIMIT %s
         """
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, api_genres)
-        result = cursor.fetchall()
+        sql_matches = """
+            SELECT 
+                mt.id, 
+                mt.connection, 
+                mt.movie
+            FROM 
+                matches mt
+            JOIN 
+                connections c ON c.id = mt.connection
+            WHERE 
+                mt.id > %s
+                AND (c.user1 = %s OR c.user2 = %s)
+            ORDER BY 
+                mt.id
+            LIMIT %s
+        """
+        with self.cursor() as cursor:
+            cursor.execute(sql_events, (user_id, after_event_id, limit))
+            events = cursor.fetchall()
+            cursor.execute(sql_matches, (after_match_id, user_id, user_id, limit))
+            matches = cursor.fetchall()
+
+        changes = {
+            'requests': {},
+            'accepted': {},
+            'matches': {},
+            'event_id': events[-1][0] if events else after_event_id,
+            'match_id': matches[-1][0] if matches else after_match_id
+        }
+        for _, kind, connection_id, email in events:
+            if kind == 'request':
+                changes['requests'][connection_id] = email
+            else:
+                changes['requests'].pop(connection_id, None)
+                changes['accepted'][connection_id] = email
+        for _, connection_id, movie_id in matches:
+            changes['matches'].setdefault(connection_id, []).append(movie_id)
+        return changes
+
+    def get_genres(self, api_genre_ids):
+        """
+        Look up genres by their API IDs in the in-memory genre catalog.
 
-        if not result:
-            return False
+        Args:
+            api_genre_ids (iterable): The API IDs of the genres.
 
-        # Convert result to a dictionary for easy lookup
-        result = dict(result)
+        Returns:
+            dict: Mapping of API genre IDs to (genre ID, name) tuples for known genres.
+        """
+        return self.genre_catalog.resolve(api_genre_ids)
 
-        # Prepare the values for the insertion into movie_x_genres
-        sql_command = """
-            INSERT IGNORE INTO movie_x_genres (movie, genre) VALUES (%s, %s)
+    @staticmethod
+    def genre_columns(movie, genres):
+        """
+        Compute the denormalized genre columns of a movie row.
+
+        Args:
+            movie (dict): A movie dictionary from the API.
+            genres (dict): Mapping of API genre IDs to (genre ID, name) tuples, see get_genres.
+
+        Returns:
+            tuple: The genre_mask and the genres display string (None if the movie has no known genre).
+        """
+        movie_genres = [genres[genre] for genre in movie["genre_ids"] if genre in genres]
+        genre_mask = 0
+        for genre_id, _ in movie_genres:
+            genre_mask |= genre_bit(genre_id)
+        genre_names = ', '.join(name for _, name in movie_genres) or None
+        return genre_mask, genre_names
+
+    @metrics.timed('database')
+    def add_movie_genre_relation(self, movies, genres):
+        """
+        Add the relationship between movies and genres in the movie_x_genres table.
+
+        The (movie API ID, genre) pairs are written to a temporary staging table
+        and resolved to movie rows with a single INSERT ... SELECT joined on
+        movies.api_id, so the result does not depend on insert order or on rows
+        skipped by INSERT IGNORE.
+
+        Args:
+            movies (list): List of movies fetched from the API.
+            genres (dict): Mapping of API genre IDs to (genre ID, name) tuples, see get_genres.
+
+        Returns:
+            bool: True if the relationships were successfully added, False otherwise.
         """
         values = []
-        for i, movie in enumerate(movies):
+        for movie in movies:
             for genre in movie["genre_ids"]:
-                values.append((last_row_id - row_count + i + 1, result[genre]))
+                if genre in genres:
+                    values += [movie["id"], genres[genre][0]]
+
+        if not values:
+            return False
 
-        cursor.executemany(sql_command, values)
-        self.connection.commit()
+        placeholders = ', '.join(['(%s, %s)'] * (len(values) // 2))
+        with self.transaction() as cursor:
+            cursor.execute("""
+                CREATE TEMPORARY TABLE IF NOT EXISTS movie_genre_staging (
+                    movie_api_id int NOT NULL,
+                    genre int NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM movie_genre_staging")
+            cursor.execute(
+                f"INSERT INTO movie_genre_staging (movie_api_id, genre) VALUES {placeholders}", values
+            )
+            cursor.execute("""
+                INSERT IGNORE INTO movie_x_genres (movie, genre)
+                SELECT 
+                    m.id, 
+                    s.genre
+                FROM 
+                    movie_genre_staging s
+                JOIN 
+                    movies m ON m.api_id = s.movie_api_id
+            """)
 
         return True
 
+    @metrics.timed('database')
+    def backfill_movie_genres(self, batch_size=1000):
+        """
+        Store genre_mask and genres on existing movie rows from movie_x_genres.
+
+        Movies are processed in ID ranges of batch_size, each in its own transaction.
+        The genre_mask, genres and poster_path columns are added first if the
+        movies table predates them.
+
+        Args:
+            batch_size (int, optional): Number of movie IDs per batch. Defaults to 1000.
+
+        Returns:
+            int: The number of updated movies.
+        """
+        with self.cursor() as cursor:
+            if not self.backend.has_column(cursor, 'movies', 'genre_mask'):
+                cursor.execute("ALTER TABLE movies ADD COLUMN genre_mask bigint UNSIGNED NOT NULL DEFAULT 0")
+            if not self.backend.has_column(cursor, 'movies', 'genres'):
+                cursor.execute("ALTER TABLE movies ADD COLUMN genres varchar(255) DEFAULT NULL")
+            if not self.backend.has_column(cursor, 'movies', 'poster_path'):
+                cursor.execute("ALTER TABLE movies ADD COLUMN poster_path varchar(255) DEFAULT NULL")
+
+        sql_select = """
+            SELECT 
+                mxg.movie, 
+                g.id, 
+                g.name
+            FROM 
+                movie_x_genres mxg
+            JOIN 
+                movie_genres g ON g.id = mxg.genre
+            WHERE 
+                mxg.movie BETWEEN %s AND %s
+            ORDER BY 
+                mxg.movie, g.id
+        """
+        sql_update = "UPDATE movies SET genre_mask = %s, genres = %s WHERE id = %s"
+
+        with self.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM movies")
+            max_id = cursor.fetchone()[0]
+
+        updated = 0
+        for first_id in range(1, max_id + 1, batch_size):
+            with self.transaction() as cursor:
+                cursor.execute(sql_select, (first_id, first_id + batch_size - 1))
+                genres = {}
+                for movie_id, genre_id, name in cursor.fetchall():
+                    genres.setdefault(movie_id, []).append((genre_id, name))
+
+                values = []
+                for movie_id, movie_genres in genres.items():
+                    genre_mask = 0
+                    for genre_id, _ in movie_genres:
+                        genre_mask |= genre_bit(genre_id)
+                    values.append((genre_mask, ', '.join(name for _, name in movie_genres), movie_id))
+                if values:
+                    cursor.executemany(sql_update, values)
+            updated += len(values)
+
+        return updated
+
+    @metrics.timed('database')
     def fetch_movie_genres(self):
         """
         Fetch and store movie genres from the API into the movie_genres table.
 
+        This is called by the genre catalog when it reloads; use get_genres to
+        look genres up.
+
         Returns:
             bool: True if genres were successfully fetched and stored, False otherwise.
         """
         genres = api.fetch_movie_genres()
-        if genres is None:
+        if not genres:
             return False
 
-        sql_command = """
-            INSERT IGNORE INTO movie_genres (api_id, name) VALUES (%s, %s)
-        """
-        values = [(genre["id"], genre["name"]) for genre in genres]
-        cursor = self.connection.cursor()
-        cursor.executemany(sql_command, values)
-        self.connection.commit()
+        placeholders = ', '.join(['(%s, %s)'] * len(genres))
+        sql_command = f"INSERT IGNORE INTO movie_genres (api_id, name) VALUES {placeholders}"
+        values = [value for genre in genres for value in (genre["id"], genre["name"])]
+        with self.transaction() as cursor:
+            cursor.execute(sql_command, values)
 
         return True
 
+    def fetch_posters(self, movies):
+        """
+        Download the posters of the given movies on a bounded pool of worker threads.
+
+        Only the small 'Posters.IngestSize' variant is downloaded; larger variants
+        are fetched on demand by get_poster.
+
+        Pairs are yielded in the order the downloads complete, so callers can store
+        each movie as soon as its poster is available. Movies without a poster path
+        and failed or timed out downloads are yielded with None as picture.
+
+        Args:
+            movies (list): List of movies fetched from the API.
+
+        Yields:
+            tuple: The movie dictionary and its poster bytes (or None).
+        """
+        with ThreadPoolExecutor(max_workers=self.poster_workers) as executor:
+            futures = {}
+            for movie in movies:
+                if not movie.get("poster_path"):
+                    yield movie, None
+                    continue
+                future = executor.submit(
+                    api.fetch_image, movie["poster_path"], self.poster_timeout, self.poster_ingest_size
+                )
+                futures[future] = movie
+
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    @metrics.timed('database')
     def fetch_new_movies(self, page=345):
         """
         Fetch and store new movies from the API into the movies table,
         and update their genre relations.
 
+        Posters are downloaded concurrently before a pooled connection is
+        taken, so the downloads never keep a connection from other requests;
+        the rows are then written with one executemany.
+
         Args:
             page (int, optional): The page number to fetch movies from. Defaults to 345.
 
@@ -298,50 +808,99 @@ class Database:
         if movies is None:
             return False
 
+        genres = self.get_genres(genre for movie in movies for genre in movie["genre_ids"])
+
         sql_command = """
-            INSERT IGNORE INTO movies (api_id, title, release_date, picture, page) VALUES (%s, %s, %s, %s, %s)
+            INSERT IGNORE INTO movies (api_id, title, release_date, poster, poster_path, genre_mask, genres, page) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
-        values = [
-            (movie["id"], movie["title"], movie["release_date"], api.fetch_image(movie["poster_path"]), page)
-            for movie in movies
-        ]
-        cursor = self.connection.cursor()
-        cursor.executemany(sql_command, values)
-        last_row_id = cursor.lastrowid
-        self.connection.commit()
-        row_count = cursor.rowcount
-
-        self.fetch_movie_genres()
-        self.add_movie_genre_relation(movies, last_row_id, row_count)
+        values = []
+        for movie, picture in self.fetch_posters(movies):
+            poster = self.posters.put(picture)
+            genre_mask, genre_names = self.genre_columns(movie, genres)
+            values.append((
+                movie["id"], movie["title"], movie["release_date"], poster, movie.get("poster_path"),
+                genre_mask, genre_names, page
+            ))
+        if values:
+            with self.cursor() as cursor:
+                cursor.executemany(sql_command, values)
+
+        self.add_movie_genre_relation(movies, genres)
 
         return True
 
-    def get_movies_for_user(self, user_id, recursive = False):
+    @metrics.timed('database')
+    def add_movies(self, rows, genres):
+        """
+        Bulk insert movies with a single multi-row statement.
+
+        Movies that are already stored are skipped through the unique api_id key.
+
+        Args:
+            rows (list): List of (movie, page, poster) tuples, where movie is a
+                movie dictionary from the API and poster its poster reference.
+            genres (dict): Mapping of API genre IDs to (genre ID, name) tuples, see get_genres.
+
+        Returns:
+            int: The number of newly inserted movies.
+        """
+        if not rows:
+            return 0
+
+        values = []
+        for movie, page, poster in rows:
+            genre_mask, genre_names = self.genre_columns(movie, genres)
+            values += [
+                movie["id"], movie["title"], movie["release_date"], poster, movie.get("poster_path"),
+                genre_mask, genre_names, page
+            ]
+
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+        sql_command = f"""
+            INSERT IGNORE INTO movies (api_id, title, release_date, poster, poster_path, genre_mask, genres, page) 
+            VALUES {placeholders}
+        """
+        with self.transaction() as cursor:
+            cursor.execute(sql_command, values)
+            return cursor.rowcount
+
+    @metrics.timed('database')
+    def get_movies_for_user(self, user_id, recursive = False, after_movie_id=0, limit=8):
         """
         Retrieve movies for a user that the user has not interacted with yet.
 
+        With ranking enabled ('Ranking' settings) the movies come from the
+        user's DeckRanker queue, best genre fit first, otherwise in ID order.
+
         Args:
             user_id (int): The ID of the user.
+            after_movie_id (int, optional): The last movie already in the user's deck. Unranked,
+                only movies with a higher ID are returned; ranked, 0 starts a new deck and any
+                other value continues the queue. Defaults to 0.
+            limit (int, optional): The maximum number of movies to return. Defaults to 8.
 
         Returns:
             dict: A dictionary of movies with their details.
         """
+        self.flush_user_interests(user_id)
+
+        if self.ranker is not None:
+            return self.__get_ranked_movies(user_id, after_movie_id, limit)
+
         sql_command = """
             SELECT
                 m.id,
                 m.title, 
                 m.release_date, 
-                m.picture,
-                GROUP_CONCAT(g.name SEPARATOR ', ') AS genres,
-                m.page
+                m.poster,
+                m.genres,
+                m.page,
+                m.poster_path
             FROM 
                 movies m
-            LEFT JOIN 
-                movie_x_genres mxg ON m.id = mxg.movie
-            LEFT JOIN 
-                movie_genres g ON mxg.genre = g.id
             WHERE 
-                m.id > COALESCE((
+                m.id > GREATEST(COALESCE((
                     SELECT 
                         movie 
                     FROM 
@@ -351,18 +910,18 @@ class Database:
                     ORDER BY 
                         movie DESC
                     LIMIT 1
-                ), 0) 
-            GROUP BY 
+                ), 0), %s)
+            ORDER BY 
                 m.id
-            LIMIT 8;
+            LIMIT %s;
         """
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (user_id,))
-        result = cursor.fetchall()
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, (user_id, after_movie_id, limit))
+            result = cursor.fetchall()
 
         if not recursive and not result:
             self.fetch_new_movies()
-            return self.get_movies_for_user(user_id, True)
+            return self.get_movies_for_user(user_id, True, after_movie_id, limit)
         elif not result:
             return None
 
@@ -374,16 +933,45 @@ class Database:
             row[0]: {
                 "title": row[1],
                 "release_date": row[2],
-                "picture": row[3],
-                "genres": row[4]
+                "poster": row[3],
+                "genres": row[4],
+                "poster_path": row[6]
             }
             for row in result
         }
         return movies
 
+    def __get_ranked_movies(self, user_id, after_movie_id, limit):
+        """
+        Retrieve the next movies of a user's ranked queue, see get_movies_for_user.
+
+        Returns:
+            dict: A dictionary of movies with their details, best first, or None if there are none.
+        """
+        movie_ids, remaining = self.ranker.next_movies(user_id, limit, restart=after_movie_id == 0)
+
+        # Store the next page of the API while the queue still holds a batch
+        if remaining < limit:
+            if self.ranker.lowest_page is None:
+                self.fetch_new_movies()
+            else:
+                self.fetch_new_movies(self.ranker.lowest_page - 1)
+            if len(movie_ids) < limit:
+                more_ids, _ = self.ranker.next_movies(user_id, limit - len(movie_ids))
+                movie_ids += more_ids
+
+        movies = self.__get_movies_by_ids(movie_ids)
+        if movies is None:
+            return None
+        return {movie_id: movies[movie_id] for movie_id in movie_ids if movie_id in movies}
+
+    @metrics.timed('database')
     def add_user_interest(self, user_id, movie_id, is_liked):
         """
-        Add a user's interest in a movie to the database.
+        Record a user's interest in a movie.
+
+        The swipe is queued in memory and written to the database with the
+        next batch, see flush_user_interests.
 
         Args:
             user_id (int): The ID of the user.
@@ -391,14 +979,257 @@ class Database:
             is_liked (bool): Whether the user liked the movie (True) or not (False).
 
         Returns:
-            bool: True if the operation was successful, False otherwise.
+            bool: True once the swipe has been queued.
         """
-        return self.__save(
-            'movie_user_interests',
-            ['user', 'movie', 'liked'],
-            [user_id, movie_id, is_liked]
-        )
+        self.swipes.add(user_id, movie_id, is_liked)
+        return True
+
+    @metrics.timed('database')
+    def get_existing_movie_ids(self, movie_ids):
+        """
+        Return which of the given movies are stored.
+
+        Args:
+            movie_ids (list): The IDs of the movies.
+
+        Returns:
+            set: The IDs of the movies that exist.
+        """
+        if not movie_ids:
+            return set()
+        with self.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM movies WHERE id IN ({', '.join(['%s'] * len(movie_ids))})", list(movie_ids)
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    @metrics.timed('database')
+    def flush_user_interests(self, user_id=None):
+        """
+        Write queued swipes to the database.
+
+        Queries that depend on a user's swipes write that user's swipes first,
+        the swipes of other users are left to the batched background writes.
+        If the database cannot be reached the swipes stay queued and are
+        retried in the background, so the query still runs on the swipes
+        stored so far.
+
+        Args:
+            user_id (int, optional): Only write the swipes of this user. Defaults to all users.
+        """
+        try:
+            self.swipes.flush(user_id)
+        except Exception:
+            logger.warning("writing swipes failed, they stay queued", exc_info=True)
+
+    @metrics.timed('database')
+    def __insert_user_interests(self, interests):
+        """
+        Write a batch of swipes, dropping the swipes the database rejects.
+
+        A batch with a rejected swipe, e.g. for a movie that does not exist,
+        is written again one swipe at a time, so only the offending swipes are
+        lost. Other errors are raised and the SwipeBuffer queues the batch again;
+        swipes are unique per user and movie, so the swipes of the batch that
+        were already committed are ignored when it is written again.
+
+        Args:
+            interests (list): List of (user_id, movie_id, is_liked) tuples.
+        """
+        try:
+            self.__write_user_interests(interests)
+            return
+        except self.backend.IntegrityError:
+            if len(interests) == 1:
+                logger.warning("dropped swipe %s rejected by the database", interests[0])
+                return
+        for interest in interests:
+            try:
+                self.__write_user_interests([interest])
+            except self.backend.IntegrityError:
+                logger.warning("dropped swipe %s rejected by the database", interest)
+
+    def __write_user_interests(self, interests):
+        """
+        Insert a batch of swipes with a single multi-row statement.
+
+        Args:
+            interests (list): List of (user_id, movie_id, is_liked) tuples.
+        """
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(interests))
+        sql_command = f"INSERT IGNORE INTO movie_user_interests (user, movie, liked) VALUES {placeholders}"
+        values = [value for interest in interests for value in interest]
+
+        swiped_movies = {}
+        liked_movies = {}
+        for user_id, movie_id, is_liked in interests:
+            swiped_movies.setdefault(user_id, []).append(movie_id)
+            if is_liked:
+                liked_movies.setdefault(user_id, []).append(movie_id)
+
+        with self.transaction() as cursor:
+            cursor.execute(sql_command, values)
+            for user_id, movie_ids in swiped_movies.items():
+                cursor.execute(
+                    f"DELETE FROM friend_pending WHERE user = %s AND movie IN ({', '.join(['%s'] * len(movie_ids))})",
+                    [user_id] + movie_ids
+                )
+            for user_id, movie_ids in liked_movies.items():
+                self.__add_matches(cursor, user_id, movie_ids)
+                self.__add_friend_pending(cursor, user_id, movie_ids)
+
+    @staticmethod
+    def __add_matches(cursor, user_id, movie_ids):
+        """
+        Record matches for movies a user just liked.
+
+        A movie becomes a match of every active connection whose other user
+        has already liked it.
+
+        Args:
+            cursor: The cursor of the running transaction.
+            user_id (int): The ID of the user who liked the movies.
+            movie_ids (list): The IDs of the liked movies.
+        """
+        sql_command = f"""
+            INSERT IGNORE INTO matches (connection, movie)
+            SELECT 
+                c.id, 
+                mui.movie
+            FROM 
+                connections c
+            JOIN 
+                movie_user_interests mui 
+                ON mui.user = CASE WHEN c.user1 = %s THEN c.user2 ELSE c.user1 END
+            WHERE 
+                (c.user1 = %s OR c.user2 = %s)
+                AND c.active = 1
+                AND mui.liked = 1
+                AND mui.movie IN ({', '.join(['%s'] * len(movie_ids))})
+        """
+        cursor.execute(sql_command, [user_id, user_id, user_id] + movie_ids)
+
+    @staticmethod
+    def __add_friend_pending(cursor, user_id, movie_ids):
+        """
+        Offer movies a user just liked to the user's active connections.
+
+        Every connected user who has not swiped a movie yet gets it in
+        friend_pending, from where DeckRanker deals it ahead of the ranked queue.
+
+        Args:
+            cursor: The cursor of the running transaction.
+            user_id (int): The ID of the user who liked the movies.
+            movie_ids (list): The IDs of the liked movies.
+        """
+        sql_command = f"""
+            INSERT IGNORE INTO friend_pending (user, movie)
+            SELECT 
+                f.friend, 
+                m.id
+            FROM (
+                SELECT 
+                    CASE WHEN c.user1 = %s THEN c.user2 ELSE c.user1 END AS friend
+                FROM 
+                    connections c
+                WHERE 
+                    (c.user1 = %s OR c.user2 = %s)
+                    AND c.active = 1
+            ) f
+            JOIN 
+                movies m ON m.id IN ({', '.join(['%s'] * len(movie_ids))})
+            WHERE 
+                NOT EXISTS (
+                    SELECT 1 
+                    FROM movie_user_interests mui 
+                    WHERE mui.user = f.friend AND mui.movie = m.id
+                )
+        """
+        cursor.execute(sql_command, [user_id, user_id, user_id] + movie_ids)
+
+    @metrics.timed('database')
+    def rebuild_friend_pending(self, connection_id=None):
+        """
+        Recompute friend_pending from movie_user_interests.
+
+        Args:
+            connection_id (int, optional): Only add the movies the two users of this
+                connection liked and the other has not swiped. Defaults to rebuilding
+                the whole table.
+
+        Returns:
+            int: The number of rows stored.
+        """
+        sql_insert = """
+            INSERT IGNORE INTO friend_pending (user, movie)
+            SELECT 
+                f.user, 
+                mui.movie
+            FROM (
+                SELECT c.id, c.user1 AS user, c.user2 AS friend FROM connections c WHERE c.active = 1
+                UNION ALL
+                SELECT c.id, c.user2 AS user, c.user1 AS friend FROM connections c WHERE c.active = 1
+            ) f
+            JOIN 
+                movie_user_interests mui ON mui.user = f.friend AND mui.liked = 1
+            WHERE 
+                NOT EXISTS (
+                    SELECT 1 
+                    FROM movie_user_interests own 
+                    WHERE own.user = f.user AND own.movie = mui.movie
+                )
+        """
+        values = []
+        if connection_id is not None:
+            sql_insert += " AND f.id = %s"
+            values.append(connection_id)
+
+        with self.transaction() as cursor:
+            # Other connections offer the same movies, so a single connection only adds rows
+            if connection_id is None:
+                cursor.execute("DELETE FROM friend_pending")
+            cursor.execute(sql_insert, values)
+            return cursor.rowcount
+
+    @metrics.timed('database')
+    def rebuild_matches(self, connection_id=None):
+        """
+        Recompute the matches table from movie_user_interests.
+
+        Args:
+            connection_id (int, optional): Only rebuild the matches of this connection.
+                Defaults to rebuilding all connections.
 
+        Returns:
+            int: The number of matches stored.
+        """
+        sql_delete = "DELETE FROM matches"
+        sql_insert = """
+            INSERT IGNORE INTO matches (connection, movie)
+            SELECT 
+                c.id, 
+                m1.movie
+            FROM 
+                connections c
+            JOIN 
+                movie_user_interests m1 ON m1.user = c.user1 AND m1.liked = 1
+            JOIN 
+                movie_user_interests m2 ON m2.user = c.user2 AND m2.movie = m1.movie AND m2.liked = 1
+            WHERE 
+                c.active = 1
+        """
+        values = []
+        if connection_id is not None:
+            sql_delete += " WHERE connection = %s"
+            sql_insert += " AND c.id = %s"
+            values.append(connection_id)
+
+        with self.transaction() as cursor:
+            cursor.execute(sql_delete, values)
+            cursor.execute(sql_insert, values)
+            return cursor.rowcount
+
+    @metrics.timed('database')
     def get_other_user_from_connection(self, user_id, connection_id):
         """
         Retrieve the user ID of the other party in a connection.
@@ -408,82 +1239,345 @@ class Database:
             connection_id (int): The ID of the connection.
 
         Returns:
-            int: The ID of the other user in the connection, or -1 if not found.
+            int: The ID of the other user in the connection, or -1 if not found or
+                the user is not part of it.
         """
         sql_command = '''
             SELECT user1, user2
             FROM connections
             WHERE id = %s
         '''
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (connection_id,))
-        result = cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, (connection_id,))
+            result = cursor.fetchone()
 
-        if result is None:
+        if result is None or user_id not in result:
             return -1
 
         # Return the user ID that is not equal to the current user ID
         return result[1] if result[0] == user_id else result[0]
 
-    def get_user_matches(self, user1, connection_id, movie_id=0):
+    @staticmethod
+    def __match_movie(row):
+        """Convert a row of USER_MATCHES_SQL to the movie details dictionary."""
+        return {
+            "title": row[1],
+            "release_date": row[2],
+            "poster": row[3],
+            "genres": row[4],
+            "poster_path": row[5]
+        }
+
+    @metrics.timed('database')
+    def get_user_matches(self, user1, connection_id, movie_id=0, limit=20):
         """
         Retrieve movies liked by both the current user and the other user in a connection.
 
         Args:
             user1 (int): The ID of the current user.
             connection_id (int): The ID of the connection.
+            movie_id (int, optional): Only return movies with a higher ID. Defaults to 0.
+            limit (int, optional): The maximum number of movies to return. Defaults to 20.
+
+        Returns:
+            dict: A dictionary where keys are movie IDs and values are dictionaries with movie details,
+                  ordered by movie ID. Returns None if no matches are found.
+        """
+        self.flush_user_interests(user1)
+
+        # Matches are maintained in the matches table as swipes are written
+        with self.cursor() as cursor:
+            cursor.execute(USER_MATCHES_SQL + " LIMIT %s", (connection_id, user1, user1, movie_id, limit))
+            result = cursor.fetchall()
+
+        if not result:
+            return None
+
+        return {row[0]: self.__match_movie(row) for row in result}
+
+    def get_user_matches_page(self, user1, connection_id, page_token=None, limit=20):
+        """
+        Retrieve one page of the matches of a connection, see get_user_matches.
+
+        Args:
+            user1 (int): The ID of the current user.
+            connection_id (int): The ID of the connection.
+            page_token (str, optional): The token returned with the previous page. Defaults to the first page.
+            limit (int, optional): The maximum number of movies to return. Defaults to 20.
+
+        Returns:
+            tuple: A dictionary of movie IDs and movie details, and the token of the
+                next page or None if this is the last page.
+
+        Raises:
+            ValueError: If the page token is invalid or belongs to another connection.
+        """
+        movie_id = 0
+        if page_token:
+            token_connection_id, movie_id = decode_token('matches', page_token, 2)
+            if token_connection_id != connection_id:
+                raise ValueError("invalid page token")
+        # One extra row tells whether another page follows
+        movies = self.get_user_matches(user1, connection_id, movie_id, limit + 1) or {}
+        if len(movies) <= limit:
+            return movies, None
+        movies = dict(list(movies.items())[:limit])
+        return movies, encode_token('matches', [connection_id, next(reversed(movies))])
+
+    def iter_user_matches(self, user1, connection_id, movie_id=0, batch_size=500):
+        """
+        Stream all matches of a connection, ordered by movie ID, see get_user_matches.
+
+        Args:
+            user1 (int): The ID of the current user.
+            connection_id (int): The ID of the connection.
+            movie_id (int, optional): Only return movies with a higher ID. Defaults to 0.
+            batch_size (int, optional): The number of rows fetched at a time. Defaults to 500.
+
+        Yields:
+            tuple: The movie ID and the movie details.
+        """
+        self.flush_user_interests(user1)
+        for row in self.stream(USER_MATCHES_SQL, (connection_id, user1, user1, movie_id), batch_size):
+            yield row[0], self.__match_movie(row)
+
+    @metrics.timed('database')
+    def create_group(self, owner_id, name):
+        """
+        Create a group and add its owner as the first member.
+
+        Args:
+            owner_id (int): The ID of the user creating the group.
+            name (str): The name of the group.
+
+        Returns:
+            int: The ID of the new group, or -1 if it could not be created.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO user_groups (name, owner) VALUES (%s, %s)", (name, owner_id))
+            group_id = cursor.lastrowid
+            cursor.execute(
+                "INSERT INTO group_members (user_group, user) VALUES (%s, %s)", (group_id, owner_id)
+            )
+        return group_id if group_id else -1
+
+    @metrics.timed('database')
+    def add_group_member(self, user_id, group_id, email):
+        """
+        Add the user with the given email to a group.
+
+        Args:
+            user_id (int): The ID of the adding user, who must be a member of the group.
+            group_id (int): The ID of the group.
+            email (str): The email of the user to add.
+
+        Returns:
+            bool: True if the user was added, False otherwise.
+        """
+        if user_id not in self.get_group_members(group_id):
+            return False
+
+        with self.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            result = cursor.fetchone()
+
+        if result is None:
+            return False
+
+        return self.__insert('group_members', ['user_group', 'user'], [group_id, result[0]])
+
+    @metrics.timed('database')
+    def get_user_groups(self, user_id):
+        """
+        Retrieve all groups a user is a member of.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            dict: A dictionary of group IDs and group names.
+        """
+        sql_command = """
+            SELECT 
+                g.id, 
+                g.name 
+            FROM group_members gm 
+            JOIN user_groups g ON g.id = gm.user_group 
+            WHERE gm.user = %s
+        """
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, (user_id,))
+            result = cursor.fetchall()
+
+        return {row[0]: row[1] for row in result}
+
+    @metrics.timed('database')
+    def get_group_members(self, group_id):
+        """
+        Retrieve the members of a group.
+
+        Args:
+            group_id (int): The ID of the group.
+
+        Returns:
+            list: The IDs of the group members.
+        """
+        with self.cursor() as cursor:
+            cursor.execute("SELECT user FROM group_members WHERE user_group = %s ORDER BY user", (group_id,))
+            result = cursor.fetchall()
+
+        return [row[0] for row in result]
+
+    @metrics.timed('database')
+    def get_group_matches(self, user_id, group_id, min_likes=None, movie_id=0, limit=20):
+        """
+        Retrieve movies liked by the members of a group.
+
+        The liked sets of all members are intersected in memory, see
+        group_matching.match_group.
+
+        Args:
+            user_id (int): The ID of the requesting user, who must be a member of the group.
+            group_id (int): The ID of the group.
+            min_likes (int, optional): Minimum number of members that must have liked a movie.
+                Defaults to all members.
             movie_id (int, optional): The minimum movie ID to start the search from. Defaults to 0.
+            limit (int, optional): The maximum number of movies to return. Defaults to 20.
 
         Returns:
             dict: A dictionary where keys are movie IDs and values are dictionaries with movie details.
                   Returns None if no matches are found.
         """
-        other_user = self.get_other_user_from_connection(user1, connection_id)
+        members = self.get_group_members(group_id)
+        if user_id not in members:
+            return None
+
+        self.flush_user_interests(user_id)
+        matches = match_group(self.liked_sets.get(members), min_likes)
+        return self.__get_movies_by_ids(bitset_ids(matches, movie_id, limit))
+
+    def __get_movies_by_ids(self, movie_ids):
+        """
+        Retrieve the details of the given movies.
+
+        Args:
+            movie_ids (list): The IDs of the movies.
 
-        if other_user == -1:
+        Returns:
+            dict: A dictionary of movies with their details ordered by ID, or None if movie_ids is empty.
+        """
+        if not movie_ids:
             return None
 
-        sql_command = """
+        sql_command = f"""
             SELECT 
-                md.id, 
-                md.title, 
-                md.release_date, 
-                md.picture, 
-                GROUP_CONCAT(g.name SEPARATOR ', ') AS genres
+                m.id, 
+                m.title, 
+                m.release_date, 
+                m.poster, 
+                m.genres,
+                m.poster_path
             FROM 
-                movie_user_interests m1
-            JOIN 
-                movie_user_interests m2 ON m1.movie = m2.movie
-            JOIN 
-                movies md ON m1.movie = md.id
-            LEFT JOIN 
-                movie_x_genres mxg ON md.id = mxg.movie
-            LEFT JOIN 
-                movie_genres g ON mxg.genre = g.id
+                movies m
             WHERE 
-                m1.user = %s
-                AND m2.user = %s
-                AND m1.liked = 1
-                AND m2.liked = 1
-                AND m1.movie > %s
-            GROUP BY 
-                md.id
-            LIMIT 20;
-        """
-        cursor = self.connection.cursor()
-        cursor.execute(sql_command, (user1, other_user, movie_id))
-        result = cursor.fetchall()
-
-        if not result:
-            return None
+                m.id IN ({', '.join(['%s'] * len(movie_ids))})
+            ORDER BY 
+                m.id
+        """
+        with self.cursor() as cursor:
+            cursor.execute(sql_command, movie_ids)
+            result = cursor.fetchall()
 
         movies = {
             row[0]: {
                 "title": row[1],
                 "release_date": row[2],
-                "picture": row[3],
-                "genres": row[4]
+                "poster": row[3],
+                "genres": row[4],
+                "poster_path": row[5]
             }
             for row in result
         }
         return movies
+
+    @metrics.timed('database')
+    def get_poster(self, poster, poster_path=None, size=None):
+        """
+        Load the image bytes of a poster, optionally in another size.
+
+        Sizes other than the ingested one are downloaded on first use and kept in
+        the poster store under the alias '<size><poster_path>'. If the download
+        fails the ingested variant is returned instead.
+
+        Args:
+            poster (str): The poster reference stored on the movie row.
+            poster_path (str, optional): The TMDb path of the poster. Defaults to None.
+            size (str, optional): The TMDb size, e.g. 'w500'. Defaults to the ingested size.
+
+        Returns:
+            bytes: The image content, or None if the poster is not available.
+        """
+        if size is None or size == self.poster_ingest_size or not poster_path:
+            return self.posters.get(poster)
+
+        alias = f"{size}{poster_path}"
+        data = self.posters.get(self.posters.resolve(alias))
+        if data is not None:
+            return data
+
+        data = api.fetch_image(poster_path, self.poster_timeout, size)
+        if data is None:
+            return self.posters.get(poster)
+        self.posters.put(data, alias)
+        return data
+
+    @metrics.timed('database')
+    def migrate_posters(self, batch_size=100, drop_column=False):
+        """
+        Move poster BLOBs from the legacy movies.picture column into the poster store.
+
+        Rows are processed in batches ordered by ID. Each migrated row gets its
+        poster reference set and its picture cleared, so an interrupted migration
+        can simply be run again.
+
+        Args:
+            batch_size (int, optional): Number of rows read per batch. Defaults to 100.
+            drop_column (bool, optional): Whether to drop the picture column afterwards. Defaults to False.
+
+        Returns:
+            int: The number of migrated posters, or -1 if there is no picture column.
+        """
+        with self.cursor() as cursor:
+            if not self.backend.has_column(cursor, 'movies', 'picture'):
+                return -1
+
+            if not self.backend.has_column(cursor, 'movies', 'poster'):
+                cursor.execute("ALTER TABLE movies ADD COLUMN poster char(64) DEFAULT NULL")
+
+        sql_select = """
+            SELECT id, picture
+            FROM movies
+            WHERE id > %s AND picture IS NOT NULL
+            ORDER BY id
+            LIMIT %s
+        """
+        sql_update = "UPDATE movies SET poster = %s, picture = NULL WHERE id = %s"
+
+        migrated = 0
+        last_id = 0
+        while True:
+            with self.transaction() as cursor:
+                cursor.execute(sql_select, (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                values = [(self.posters.put(bytes(picture)), movie_id) for movie_id, picture in rows]
+                cursor.executemany(sql_update, values)
+            migrated += len(rows)
+            last_id = rows[-1][0]
+
+        if drop_column:
+            with self.cursor() as cursor:
+                cursor.execute("ALTER TABLE movies DROP COLUMN picture")
+
+        return migrated
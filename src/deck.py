@@ -0,0 +1,107 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from base import get_app_config
+
+
+class DeckSignals(QObject):
+    """Signals emitted by a DeckWorker."""
+    batch_ready = Signal(list)
+    failed = Signal()
+
+
+class DeckWorker(QRunnable):
+    """A background task that loads the next batch of cards for the swipe deck."""
+
+    def __init__(self, db, user_id, after_movie_id, batch_size):
+        """
+        Initialize the DeckWorker.
+
+        Args:
+            db (Database): The database to query.
+            user_id (int): The ID of the swiping user.
+            after_movie_id (int): The ID of the last movie already in the deck.
+            batch_size (int): The maximum number of movies to load.
+        """
+        super().__init__()
+        self.signals = DeckSignals()
+        self.db = db
+        self.user_id = user_id
+        self.after_movie_id = after_movie_id
+        self.batch_size = batch_size
+
+    def run(self):
+        """Query the next movies off the UI thread."""
+        try:
+            movies = self.db.get_movies_for_user(
+                self.user_id, after_movie_id=self.after_movie_id, limit=self.batch_size
+            )
+        except Exception:
+            movies = None
+        if movies is None:
+            self.signals.failed.emit()
+            return
+
+        cards = [dict(movie, id=movie_id) for movie_id, movie in movies.items()]
+        self.signals.batch_ready.emit(cards)
+
+
+class DeckPrefetcher(QObject):
+    """
+    Keeps the swipe deck filled by loading cards in the background.
+
+    A new batch is requested once the number of unseen cards drops to the
+    low-water mark. Only one batch is loaded at a time, so the deck never
+    receives the same movies twice.
+    """
+    batch_ready = Signal(list)
+    failed = Signal()
+
+    def __init__(self, db, parent=None):
+        """
+        Initialize the DeckPrefetcher with the 'Deck' settings.
+
+        Args:
+            db (Database): The database to load the cards from.
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        config = get_app_config().get('Deck', {})
+        self.low_water_mark = config.get('LowWaterMark', 3)
+        self.batch_size = config.get('BatchSize', 8)
+        self.db = db
+        self.in_flight = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def request(self, user_id, after_movie_id, remaining):
+        """
+        Start loading the next batch if the deck is running low.
+
+        Args:
+            user_id (int): The ID of the swiping user.
+            after_movie_id (int): The ID of the last movie already in the deck.
+            remaining (int): The number of cards the user has not seen yet.
+
+        Returns:
+            bool: True if a batch is being loaded, False otherwise.
+        """
+        if self.in_flight:
+            return True
+        if remaining > self.low_water_mark:
+            return False
+
+        self.in_flight = True
+        worker = DeckWorker(self.db, user_id, after_movie_id, self.batch_size)
+        worker.signals.batch_ready.connect(self.__on_batch_ready)
+        worker.signals.failed.connect(self.__on_failed)
+        self.pool.start(worker)
+        return True
+
+    def __on_batch_ready(self, cards):
+        """Forward a loaded batch to the UI."""
+        self.in_flight = False
+        self.batch_ready.emit(cards)
+
+    def __on_failed(self):
+        """Forward a failed load to the UI."""
+        self.in_flight = False
+        self.failed.emit()
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class GenreCatalog:
+    """
+    An in-memory copy of the movie_genres table.
+
+    The catalog is loaded on first use and reloaded when its TTL has expired
+    or when a genre ID shows up that it does not know yet. A reload first
+    stores the current TMDb genre list, so new genres get a row ID.
+    """
+
+    def __init__(self, db, ttl=86400):
+        """
+        Initialize the GenreCatalog.
+
+        Args:
+            db (Database): The database holding the movie_genres table.
+            ttl (float, optional): Seconds after which the catalog is reloaded. Defaults to one day.
+        """
+        self.db = db
+        self.ttl = ttl
+        self.genres = {}
+        self.unresolvable = set()
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def __reload(self):
+        """Store the TMDb genre list and read back the whole movie_genres table."""
+        self.db.fetch_movie_genres()
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT api_id, id, name FROM movie_genres")
+            result = cursor.fetchall()
+
+        self.genres = {row[0]: (row[1], row[2]) for row in result}
+        self.unresolvable = set()
+        self.loaded_at = time.monotonic()
+
+    def resolve(self, api_genre_ids):
+        """
+        Look up genres by their API IDs.
+
+        IDs that are still unknown after a reload are remembered until the TTL
+        expires, so they do not cause a reload on every call.
+
+        Args:
+            api_genre_ids (iterable): The API IDs of the genres.
+
+        Returns:
+            dict: Mapping of API genre IDs to (genre ID, name) tuples for known genres.
+        """
+        api_genre_ids = set(api_genre_ids)
+        with self.lock:
+            expired = self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+            unknown = api_genre_ids - self.genres.keys() - self.unresolvable
+            if expired or unknown:
+                self.__reload()
+                self.unresolvable = api_genre_ids - self.genres.keys()
+            return {api_id: self.genres[api_id] for api_id in api_genre_ids if api_id in self.genres}
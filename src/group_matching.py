@@ -0,0 +1,144 @@
+import threading
+
+
+def match_group(bitsets, min_likes=None):
+    """
+    Combine the liked sets of a group into the set of matching movies.
+
+    Every bitset holds one bit per movie ID. Without min_likes the result is
+    the intersection of all sets. With min_likes a movie matches once at
+    least that many members liked it; the count is tracked with one bitset
+    per threshold, so the cost is O(N * K) bitwise operations regardless of
+    how many swipes the members made.
+
+    Args:
+        bitsets (list): The liked-movie bitsets of the group members.
+        min_likes (int, optional): Minimum number of members that must have liked a movie.
+            Defaults to all members.
+
+    Returns:
+        int: The bitset of matching movie IDs.
+    """
+    if not bitsets:
+        return 0
+    if min_likes is None or min_likes >= len(bitsets):
+        result = bitsets[0]
+        for bitset in bitsets[1:]:
+            result &= bitset
+        return result
+    if min_likes <= 0:
+        min_likes = 1
+
+    # at_least[k] holds the movies liked by at least k of the members seen so far
+    at_least = [-1] + [0] * min_likes
+    for bitset in bitsets:
+        for k in range(min_likes, 0, -1):
+            at_least[k] |= at_least[k - 1] & bitset
+    return at_least[min_likes]
+
+
+def bitset_ids(bitset, after_id=0, limit=None):
+    """
+    List the IDs stored in a bitset in ascending order.
+
+    Args:
+        bitset (int): The bitset to read.
+        after_id (int, optional): Only return IDs greater than this one. Defaults to 0.
+        limit (int, optional): The maximum number of IDs to return. Defaults to no limit.
+
+    Returns:
+        list: The IDs whose bits are set.
+    """
+    ids = []
+    bitset >>= after_id + 1
+    offset = after_id + 1
+    while bitset and (limit is None or len(ids) < limit):
+        lowest = bitset & -bitset
+        position = lowest.bit_length() - 1
+        ids.append(offset + position)
+        bitset >>= position + 1
+        offset += position + 1
+    return ids
+
+
+class LikedSets:
+    """
+    Per-user sets of liked movie IDs, stored as integer bitsets.
+
+    A user's likes are loaded with one query the first time they are needed.
+    Afterwards the sets are kept current by reading only the
+    movie_user_interests rows added since the last refresh. Row IDs can commit
+    out of order, e.g. when several clients write their own swipe batches, so
+    the last `window` IDs before the refresh mark are read again; adding a like
+    twice leaves the set unchanged.
+    """
+
+    def __init__(self, db, window=100):
+        """
+        Initialize the LikedSets cache.
+
+        Args:
+            db (Database): The database to load the likes from.
+            window (int, optional): Number of row IDs below the refresh mark read again. Defaults to 100.
+        """
+        self.db = db
+        self.window = window
+        self.bitsets = {}
+        self.last_id = None
+        self.lock = threading.Lock()
+
+    def __refresh(self):
+        """Apply the likes recorded since the last refresh to the cached users."""
+        with self.db.cursor() as cursor:
+            if self.last_id is None:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM movie_user_interests")
+                self.last_id = cursor.fetchone()[0]
+                return
+            cursor.execute(
+                "SELECT id, user, movie FROM movie_user_interests WHERE id > %s AND liked = 1 ORDER BY id",
+                (max(self.last_id - self.window, 0),)
+            )
+            rows = cursor.fetchall()
+
+        for row_id, user_id, movie_id in rows:
+            if user_id in self.bitsets:
+                self.bitsets[user_id] |= 1 << movie_id
+            self.last_id = max(self.last_id, row_id)
+
+    def __load(self, user_ids):
+        """
+        Load the complete liked sets of users that are not cached yet.
+
+        Args:
+            user_ids (list): The IDs of the users to load.
+        """
+        sql_command = f"""
+            SELECT user, movie 
+            FROM movie_user_interests 
+            WHERE liked = 1 AND user IN ({', '.join(['%s'] * len(user_ids))})
+        """
+        with self.db.cursor() as cursor:
+            cursor.execute(sql_command, user_ids)
+            rows = cursor.fetchall()
+
+        bitsets = dict.fromkeys(user_ids, 0)
+        for user_id, movie_id in rows:
+            bitsets[user_id] |= 1 << movie_id
+        self.bitsets.update(bitsets)
+
+    def get(self, user_ids):
+        """
+        Return the current liked sets of the given users.
+
+        Args:
+            user_ids (list): The IDs of the users.
+
+        Returns:
+            list: One bitset per user, in the order of user_ids.
+        """
+        with self.lock:
+            self.__refresh()
+            missing = [user_id for user_id in user_ids if user_id not in self.bitsets]
+            if missing:
+                self.__load(missing)
+            return [self.bitsets[user_id] for user_id in user_ids]
@@ -0,0 +1,275 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# Every disk entry starts with its expiry time as a big-endian double
+HEADER = struct.Struct('>d')
+
+
+class MemoryCache:
+    """A thread-safe LRU cache of response bodies bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        """
+        Initialize the MemoryCache.
+
+        Args:
+            max_bytes (int): The maximum total size of the stored bodies.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return a fresh body and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bytes: The body, or None if it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, body = entry
+            if expires < time.time():
+                self.__remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return body
+
+    def set(self, key, body, expires):
+        """
+        Store a body, evicting the least recently used entries to stay within budget.
+
+        Args:
+            key (str): The cache key.
+            body (bytes): The body to store.
+            expires (float): The expiry as a UNIX timestamp (math.inf for immutable bodies).
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.__remove(key)
+            self.entries[key] = (expires, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self.__remove(next(iter(self.entries)))
+
+    def __remove(self, key):
+        """Drop an entry and update the size accounting."""
+        _, body = self.entries.pop(key)
+        self.size -= len(body)
+
+
+class DiskCache:
+    """
+    A directory of cached response bodies bounded by their total size.
+
+    Each entry is a file named after the SHA-256 of its key. Entries are evicted
+    in least-recently-used order, which survives restarts through the file
+    modification times.
+    """
+
+    def __init__(self, path, max_bytes):
+        """
+        Initialize the DiskCache and index the existing entries.
+
+        Args:
+            path (str): The cache directory.
+            max_bytes (int): The maximum total size of the cache files.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        files = []
+        for name in os.listdir(path):
+            if name.endswith('.tmp'):
+                # Left over from an interrupted write
+                os.remove(os.path.join(path, name))
+                continue
+            stat = os.stat(os.path.join(path, name))
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.size += size
+
+    def __file(self, name):
+        """Return the path of an entry file."""
+        return os.path.join(self.path, name)
+
+    def get(self, key):
+        """
+        Return a fresh body with its expiry and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            tuple: The body and its expiry as a UNIX timestamp, or None if it is missing or expired.
+        """
+        name = hashlib.sha256(key.encode()).hexdigest()
+        with self.lock:
+            if name not in self.entries:
+                return None
+            try:
+                with open(self.__file(name), 'rb') as file:
+                    data = file.read()
+            except OSError:
+                self.__remove(name)
+                return None
+            expires = HEADER.unpack_from(data)[0]
+            if expires < time.time():
+                self.__remove(name)
+                return None
+            self.entries.move_to_end(name)
+            os.utime(self.__file(name))
+            return data[HEADER.size:], expires
+
+    def set(self, key, body, expires):
+        """
+        Store a body, evicting the least recently used entries to stay within budget.
+
+        Args:
+            key (str): The cache key.
+            body (bytes): The body to store.
+            expires (float): The expiry as a UNIX timestamp (math.inf for immutable bodies).
+        """
+        size = HEADER.size + len(body)
+        if size > self.max_bytes:
+            return
+        name = hashlib.sha256(key.encode()).hexdigest()
+        with self.lock:
+            if name in self.entries:
+                self.__remove(name)
+            temp_path = f"{self.__file(name)}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(HEADER.pack(expires))
+                file.write(body)
+            os.replace(temp_path, self.__file(name))
+            self.entries[name] = size
+            self.size += size
+            while self.size > self.max_bytes:
+                self.__remove(next(iter(self.entries)))
+
+    def __remove(self, name):
+        """Delete an entry file and update the size accounting."""
+        self.size -= self.entries.pop(name)
+        try:
+            os.remove(self.__file(name))
+        except OSError:
+            pass
+
+
+class TieredCache:
+    """
+    A memory LRU in front of a disk cache, with per-endpoint expiry policies.
+
+    Bodies found on disk are promoted to memory with the expiry stored on disk.
+    Hits, misses and served and stored bytes are counted per endpoint.
+    """
+
+    def __init__(self, memory, disk, ttls):
+        """
+        Initialize the TieredCache.
+
+        Args:
+            memory (MemoryCache): The memory tier.
+            disk (DiskCache): The disk tier.
+            ttls (dict): Seconds until expiry per endpoint; None marks immutable bodies.
+        """
+        self.memory = memory
+        self.disk = disk
+        self.ttls = ttls
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def __count(self, endpoint, counter, amount=1):
+        """Increase one of the statistics counters of an endpoint."""
+        with self.lock:
+            counters = self.counters.setdefault(endpoint, dict.fromkeys(
+                ['memory_hits', 'disk_hits', 'misses', 'bytes_served', 'bytes_stored'], 0
+            ))
+            counters[counter] += amount
+
+    def get(self, endpoint, key):
+        """
+        Look a body up in memory, then on disk.
+
+        Args:
+            endpoint (str): The endpoint the key belongs to.
+            key (str): The cache key, usually the request URL.
+
+        Returns:
+            bytes: The cached body, or None on a miss.
+        """
+        body = self.memory.get(key)
+        if body is not None:
+            self.__count(endpoint, 'memory_hits')
+            self.__count(endpoint, 'bytes_served', len(body))
+            return body
+
+        entry = self.disk.get(key)
+        if entry is not None:
+            body, expires = entry
+            self.__count(endpoint, 'disk_hits')
+            self.__count(endpoint, 'bytes_served', len(body))
+            self.memory.set(key, body, expires)
+            return body
+
+        self.__count(endpoint, 'misses')
+        return None
+
+    def set(self, endpoint, key, body):
+        """
+        Store a body in both tiers with the endpoint's expiry.
+
+        Args:
+            endpoint (str): The endpoint the key belongs to.
+            key (str): The cache key, usually the request URL.
+            body (bytes): The body to store.
+        """
+        expires = self.__expires(endpoint)
+        if expires <= time.time():
+            return
+        self.memory.set(key, body, expires)
+        self.disk.set(key, body, expires)
+        self.__count(endpoint, 'bytes_stored', len(body))
+
+    def __expires(self, endpoint):
+        """Return the expiry timestamp for a body of the given endpoint stored now."""
+        ttl = self.ttls.get(endpoint, 0)
+        if ttl is None:
+            return math.inf
+        return time.time() + ttl
+
+    def stats(self):
+        """
+        Return the cache statistics.
+
+        Returns:
+            dict: Counters per endpoint with their hit ratio, plus the current tier sizes in bytes.
+        """
+        with self.lock:
+            endpoints = {endpoint: dict(counters) for endpoint, counters in self.counters.items()}
+        for counters in endpoints.values():
+            lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+            counters['hit_ratio'] = (counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        return {
+            'endpoints': endpoints,
+            'memory_bytes': self.memory.size,
+            'disk_bytes': self.disk.size
+        }
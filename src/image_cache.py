@@ -0,0 +1,219 @@
+import time
+from collections import OrderedDict
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QPixmap
+from base import get_app_config
+from metrics import metrics
+
+
+class PixmapCache:
+    """An LRU cache of decoded pixmaps bounded by their memory footprint."""
+
+    def __init__(self, max_bytes):
+        """
+        Initialize the PixmapCache.
+
+        Args:
+            max_bytes (int): The maximum total size of the cached pixmaps.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cost(pixmap):
+        """Return the memory footprint of a pixmap in bytes."""
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key):
+        """
+        Return a cached pixmap and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            QPixmap: The pixmap, or None if it is not cached.
+        """
+        pixmap = self.entries.get(key)
+        if pixmap is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return pixmap
+
+    def stats(self):
+        """
+        Return the hit and size statistics of the cache.
+
+        Returns:
+            dict: Hits, misses, hit ratio, number of pixmaps and their size in bytes.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'bytes': self.size
+        }
+
+    def set(self, key, pixmap):
+        """
+        Store a pixmap, evicting the least recently used ones to stay within budget.
+
+        Args:
+            key: The cache key.
+            pixmap (QPixmap): The pixmap to store.
+        """
+        if key in self.entries:
+            self.size -= self.cost(self.entries.pop(key))
+        self.entries[key] = pixmap
+        self.size += self.cost(pixmap)
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.cost(evicted)
+
+
+class DecodeSignals(QObject):
+    """Signals emitted by a DecodeWorker."""
+    decoded = Signal(int, str, QImage)
+
+
+class DecodeWorker(QRunnable):
+    """A background task that loads a poster variant and decodes it into a scaled QImage."""
+
+    def __init__(self, db, movie, variant, size):
+        """
+        Initialize the DecodeWorker.
+
+        Args:
+            db (Database): The database providing the poster bytes.
+            movie (dict): The movie with its id, poster and poster_path.
+            variant (str): The TMDb size of the poster to load, e.g. 'w185'.
+            size (QSize): The size to scale the image to, keeping its aspect ratio.
+        """
+        super().__init__()
+        self.signals = DecodeSignals()
+        self.db = db
+        self.movie = movie
+        self.variant = variant
+        self.size = size
+
+    def run(self):
+        """Load and decode the poster off the UI thread."""
+        try:
+            data = self.db.get_poster(self.movie["poster"], self.movie.get("poster_path"), self.variant)
+        except Exception:
+            # A null image is still emitted, so the loader stops waiting for this poster
+            data = None
+        start = time.perf_counter()
+        image = QImage()
+        image.loadFromData(data or b"")
+        if not image.isNull():
+            image = image.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        metrics.observe('image', 'decode', time.perf_counter() - start, size=len(data or b""),
+                        failed=image.isNull())
+        self.signals.decoded.emit(self.movie["id"], self.variant, image)
+
+
+class ImageLoader(QObject):
+    """
+    Decodes posters on worker threads and caches the resulting pixmaps.
+
+    Every poster exists in two variants: the small one stored at ingestion and
+    the smallest TMDb size that covers the display width. The small variant is
+    decoded ahead of time and shown first; the display variant is loaded when a
+    poster is actually shown and replaces it once ready. `ready` is emitted
+    with the movie ID whenever a variant has been cached.
+    """
+    ready = Signal(int)
+
+    def __init__(self, db, parent=None):
+        """
+        Initialize the ImageLoader with the 'Images' and 'Posters' settings.
+
+        Args:
+            db (Database): The database providing the poster bytes.
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        config = get_app_config().get('Images', {})
+        self.size = QSize(config.get('Width', 300), config.get('Height', 450))
+        self.cache = PixmapCache(config.get('CacheBytes', 64 * 1024 * 1024))
+
+        poster_config = get_app_config().get('Posters', {})
+        sizes = poster_config.get('Sizes', {"w92": 92, "w185": 185, "w342": 342, "w500": 500})
+        self.thumbnail_variant = poster_config.get('IngestSize', 'w185')
+        self.display_variant = self.pick_variant(sizes, self.size.width())
+
+        self.db = db
+        self.pending = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(config.get('Workers', 2))
+        metrics.add_collector('pixmap_cache', 'cache', lambda: {'pixmaps': self.cache.stats()})
+
+    @staticmethod
+    def pick_variant(sizes, width):
+        """
+        Return the smallest poster size that is at least as wide as the display.
+
+        Args:
+            sizes (dict): Mapping of TMDb size names to their widths in pixels.
+            width (int): The display width in pixels.
+
+        Returns:
+            str: The chosen size name, or the widest one if none is wide enough.
+        """
+        fitting = [(size_width, name) for name, size_width in sizes.items() if size_width >= width]
+        if fitting:
+            return min(fitting)[1]
+        return max((size_width, name) for name, size_width in sizes.items())[1]
+
+    def __request_variant(self, movie, variant):
+        """Start decoding one variant unless it is cached or already being decoded."""
+        key = (movie["id"], variant)
+        if key in self.pending or self.cache.get(key) is not None:
+            return
+        self.pending.add(key)
+        worker = DecodeWorker(self.db, movie, variant, self.size)
+        worker.signals.decoded.connect(self.__on_decoded)
+        self.pool.start(worker)
+
+    def request(self, movie, full=False):
+        """
+        Start decoding a movie's poster.
+
+        Args:
+            movie (dict): The movie with its id, poster and poster_path.
+            full (bool, optional): Also load the display variant. Defaults to only the thumbnail.
+        """
+        self.__request_variant(movie, self.thumbnail_variant)
+        if full and movie.get("poster_path") and self.display_variant != self.thumbnail_variant:
+            self.__request_variant(movie, self.display_variant)
+
+    def get(self, movie_id):
+        """
+        Return the best cached pixmap of a movie's poster.
+
+        Args:
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            QPixmap: The display variant if decoded, else the thumbnail, else None.
+        """
+        pixmap = self.cache.get((movie_id, self.display_variant))
+        if pixmap is None:
+            pixmap = self.cache.get((movie_id, self.thumbnail_variant))
+        return pixmap
+
+    def __on_decoded(self, movie_id, variant, image):
+        """Convert a decoded image into a pixmap on the UI thread and cache it."""
+        self.pending.discard((movie_id, variant))
+        if image.isNull():
+            return
+        self.cache.set((movie_id, variant), QPixmap.fromImage(image))
+        self.ready.emit(movie_id)
@@ -1,11 +1,24 @@
+import time
+
+# Taken before the other imports so the startup report includes them
+STARTED = time.perf_counter()
+
 import sys
 from datetime import datetime
 from base import hash_password
-from database import Database
+from deck import DeckPrefetcher
+from change_feed import ChangeFeed
+from connection_model import ConnectionListModel
+from image_cache import ImageLoader
+from metrics import metrics
+from startup import StartupTimer, DatabaseConnector
 from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLineEdit, QPushButton, QMessageBox, \
-    QStackedLayout, QListWidget, QHBoxLayout, QLabel
+    QStackedLayout, QListView, QHBoxLayout, QLabel
 from PySide6.QtGui import QPixmap
-from PySide6.QtCore import QFile, QByteArray, QTextStream, Qt
+from PySide6.QtCore import QFile, QTextStream, Qt, QTimer
+
+# Opened in the background once the login window is shown, see DatabaseConnector
+db = None
 
 
 class MovieTinder(QMainWindow):
@@ -13,6 +26,7 @@ class MovieTinder(QMainWindow):
         super().__init__()
 
         self.match_ids = None
+        self.match_page_token = None
         self.match_index = -1
         self.matches = None
         self.selected_connection = None
@@ -45,6 +59,12 @@ class MovieTinder(QMainWindow):
         self.matches_widget = None
         self.match_details_widget = None
         self.main_layout = None
+        self.login_button = None
+        self.signup_button = None
+        self.waiting_for_movies = False
+        self.deck = None
+        self.images = None
+        self.changes = None
         self.setWindowTitle("MovieTinder")
 
         self.init_ui()
@@ -57,24 +77,8 @@ class MovieTinder(QMainWindow):
         # Main stacked layout to switch between login, sign up, main page, swiping page, and matches page views
         self.main_layout = QStackedLayout()
 
-        # Create login, sign up, main page, swiping page, and matches page widgets
-        self.login_widget = self.create_login_widget()
-        self.signup_widget = self.create_signup_widget()
-        self.main_page_widget = self.create_main_page_widget()
-        self.swiping_widget = self.create_swiping_widget()
-        self.matches_widget = self.create_matches_widget()
-        self.match_details_widget = self.create_match_details_widget()
-
-        # Add widgets to the main stacked layout
-        self.main_layout.addWidget(self.login_widget)
-        self.main_layout.addWidget(self.signup_widget)
-        self.main_layout.addWidget(self.main_page_widget)
-        self.main_layout.addWidget(self.swiping_widget)
-        self.main_layout.addWidget(self.matches_widget)
-        self.main_layout.addWidget(self.match_details_widget)
-
-        # Set initial widget to login view
-        self.main_layout.setCurrentWidget(self.login_widget)
+        # Only the login view is built up front, the other pages are created on first use
+        self.show_page('login')
 
         # Set central layout
         central_layout = QVBoxLayout(central_widget)
@@ -93,18 +97,19 @@ class MovieTinder(QMainWindow):
         self.password_login = QLineEdit()
         self.password_login.setPlaceholderText("Password")
         self.password_login.setEchoMode(QLineEdit.Password)
-        login_button = QPushButton("Login")
+        self.login_button = QPushButton("Login")
+        self.login_button.setEnabled(db is not None)
         switch_to_signup_button = QPushButton("Sign Up Instead")
 
         layout.addWidget(self.email_login)
         layout.addWidget(self.password_login)
-        layout.addWidget(login_button)
+        layout.addWidget(self.login_button)
         layout.addWidget(switch_to_signup_button)
 
         login_widget.setLayout(layout)
 
         # Connect button signals to slots
-        login_button.clicked.connect(self.login)
+        self.login_button.clicked.connect(self.login)
         switch_to_signup_button.clicked.connect(self.switch_to_signup)
 
         return login_widget
@@ -123,19 +128,20 @@ class MovieTinder(QMainWindow):
         self.confirm_password_signup.setPlaceholderText("Confirm Password")
         self.confirm_password_signup.setEchoMode(QLineEdit.Password)
 
-        signup_button = QPushButton("Sign Up")
+        self.signup_button = QPushButton("Sign Up")
+        self.signup_button.setEnabled(db is not None)
         switch_to_login_button = QPushButton("Back to Login")
 
         layout.addWidget(self.email_signup)
         layout.addWidget(self.password_signup)
         layout.addWidget(self.confirm_password_signup)
-        layout.addWidget(signup_button)
+        layout.addWidget(self.signup_button)
         layout.addWidget(switch_to_login_button)
 
         signup_widget.setLayout(layout)
 
         # Connect button signals to slots
-        signup_button.clicked.connect(self.sign_up)
+        self.signup_button.clicked.connect(self.sign_up)
         switch_to_login_button.clicked.connect(self.switch_to_login)
 
         return signup_widget
@@ -148,9 +154,10 @@ class MovieTinder(QMainWindow):
         self.email_input = QLineEdit()
         self.email_input.setPlaceholderText("Enter email to add user")
         add_button = QPushButton("Add")
-        self.requests_list = QListWidget()
+        self.requests_list = QListView()
+        self.requests_list.setModel(self.requests)
+        self.requests_list.setUniformItemSizes(True)
         accept_button = QPushButton("Accept")
-        refresh_button = QPushButton("Refresh Requests")
         switch_to_swiping_button = QPushButton("Start Swiping")
         switch_to_matches_button = QPushButton("View Matches")
 
@@ -166,7 +173,6 @@ class MovieTinder(QMainWindow):
 
         layout.addLayout(email_input_layout)
         layout.addLayout(requests_list_layout)
-        layout.addWidget(refresh_button)
         layout.addWidget(switch_to_swiping_button)
         layout.addWidget(switch_to_matches_button)
 
@@ -175,7 +181,6 @@ class MovieTinder(QMainWindow):
         # Connect button signals to slots
         add_button.clicked.connect(self.add_user_by_email)
         accept_button.clicked.connect(self.accept_request)
-        refresh_button.clicked.connect(self.refresh_requests)
         switch_to_swiping_button.clicked.connect(self.switch_to_swiping)
         switch_to_matches_button.clicked.connect(self.switch_to_matches)
 
@@ -231,7 +236,9 @@ class MovieTinder(QMainWindow):
         matches_widget = QWidget()
         layout = QVBoxLayout()
 
-        self.matches_list = QListWidget()
+        self.matches_list = QListView()
+        self.matches_list.setModel(self.connections)
+        self.matches_list.setUniformItemSizes(True)
         view_match_button = QPushButton("View Match")
         back_to_main_button = QPushButton("Back to Main Page")
 
@@ -290,6 +297,58 @@ class MovieTinder(QMainWindow):
 
         return match_details_widget
 
+    def show_page(self, name):
+        """
+        Show a page of the stacked layout, creating it on first use.
+
+        Args:
+            name (str): The page name, e.g. 'main_page' for main_page_widget and create_main_page_widget.
+        """
+        widget = getattr(self, f"{name}_widget")
+        if widget is None:
+            widget = getattr(self, f"create_{name}_widget")()
+            setattr(self, f"{name}_widget", widget)
+            self.main_layout.addWidget(widget)
+        self.main_layout.setCurrentWidget(widget)
+
+    def database_ready(self, database):
+        """Take over the database opened in the background and enable logging in."""
+        global db
+
+        db = database
+        self.deck = DeckPrefetcher(db, self)
+        self.deck.batch_ready.connect(self.add_movies_to_deck)
+        self.deck.failed.connect(self.movies_failed)
+        self.images = ImageLoader(db, self)
+        self.images.ready.connect(self.poster_ready)
+        self.requests = ConnectionListModel(
+            lambda token, limit: db.get_users_connections_page(self.id, True, token, limit), self
+        )
+        self.connections = ConnectionListModel(
+            lambda token, limit: db.get_users_connections_page(self.id, False, token, limit), self
+        )
+        self.changes = ChangeFeed(db, self)
+        self.changes.requests_added.connect(self.requests_added)
+        self.changes.connections_accepted.connect(self.connections_accepted)
+        self.changes.matches_added.connect(self.matches_added)
+        self.login_button.setEnabled(True)
+        if self.signup_button is not None:
+            self.signup_button.setEnabled(True)
+
+    def database_failed(self, message):
+        """Report that the database could not be opened and close the window."""
+        QMessageBox.critical(self, "Database", f"Could not connect to the database: {message}")
+        self.close()
+
+    def closeEvent(self, event):
+        """Write pending swipes and export the metrics before the window closes."""
+        if self.changes is not None:
+            self.changes.stop()
+        if db is not None:
+            db.flush_user_interests()
+        metrics.dump()
+        super().closeEvent(event)
+
     def apply_stylesheet(self):
         """Apply external CSS stylesheet to the application."""
         file = QFile("../resources/stylesheet.css")
@@ -317,9 +376,11 @@ class MovieTinder(QMainWindow):
             return
         else:
             QMessageBox.information(self, "Login", "Login Successful")
-            self.main_layout.setCurrentWidget(self.main_page_widget)
-            # Display requests
-            self.refresh_requests()
+            # Changes made from now on arrive through the change feed, the lists load their pages when shown
+            self.changes.start(self.id)
+            self.requests.reset()
+            self.connections.reset()
+            self.show_page('main_page')
 
     def sign_up(self):
         """Attempt to sign up with the provided email, password, and confirmation password."""
@@ -345,35 +406,32 @@ class MovieTinder(QMainWindow):
 
     def switch_to_signup(self):
         """Switch to the sign-up view and clear sign-up input fields."""
+        self.show_page('signup')
         self.clear_signup_fields()
-        self.main_layout.setCurrentWidget(self.signup_widget)
 
     def switch_to_login(self):
         """Switch to the login view and clear login input fields."""
         self.clear_login_fields()
-        self.main_layout.setCurrentWidget(self.login_widget)
+        self.show_page('login')
 
     def switch_to_main_page(self):
         """Switch to the main page view."""
-        self.main_layout.setCurrentWidget(self.main_page_widget)
+        self.show_page('main_page')
 
     def switch_to_swiping(self):
         """Switch to the swiping page view."""
-        self.main_layout.setCurrentWidget(self.swiping_widget)
+        self.show_page('swiping')
         self.movie_index -= 1
         self.display_next_movie()
 
     def switch_to_matches(self):
         """Switch to the matches page view."""
-        self.main_layout.setCurrentWidget(self.matches_widget)
-        self.matches_list.clear()
-        connections = db.get_users_connections(self.id)
-        self.connections = {value: key for (key, value) in connections.items()}
-        self.matches_list.addItems(list(connections.values()))
+        # Kept up to date by connections_accepted and matches_added
+        self.show_page('matches')
 
     def switch_to_match_details(self):
         """Switch to the match details view."""
-        self.main_layout.setCurrentWidget(self.match_details_widget)
+        self.show_page('match_details')
         self.match_index = -1
         self.next_match()
 
@@ -402,50 +460,92 @@ class MovieTinder(QMainWindow):
 
     def accept_request(self):
         """Accept the selected email from the requests list."""
-        selected_items = self.requests_list.selectedItems()
-        if not selected_items:
+        selected = self.requests_list.selectedIndexes()
+        if not selected:
             QMessageBox.warning(self, "No Selection", "No email selected")
             return
-        for item in selected_items:
-            db.accept_connection(self.requests[item.text()])
-            QMessageBox.information(self, "Request Accepted", f"Accepted Request: {item.text()}")
-        self.refresh_requests()
-
-    def refresh_requests(self):
-        """Refresh the requests list (clear and reload, if necessary)."""
-        self.requests_list.clear()
-        requests = db.get_users_connections(self.id, True)
-        self.requests = {value: key for (key, value) in requests.items()}
-        self.requests_list.addItems(list(requests.values()))
+        # Read the rows before removing any of them
+        for connection_id, email in [(self.requests.connection_id(index), index.data()) for index in selected]:
+            db.accept_connection(connection_id)
+            self.requests.remove(connection_id)
+            QMessageBox.information(self, "Request Accepted", f"Accepted Request: {email}")
+
+    def requests_added(self, requests):
+        """Add connection requests that arrived since the last poll."""
+        self.requests.add(requests)
+
+    def connections_accepted(self, connections):
+        """Move connections accepted since the last poll from the requests to the matches list."""
+        for connection_id in connections:
+            self.requests.remove(connection_id)
+        self.connections.add(connections)
+
+    def matches_added(self, matches):
+        """Count the matches that arrived since the last poll on their connections."""
+        for connection_id, movie_ids in matches.items():
+            self.connections.add_new_matches(connection_id, movie_ids)
 
     def like_movie(self):
         """Handle liking a movie."""
+        if not self.is_movie_displayed():
+            return
         db.add_user_interest(self.id, self.movie_ids[self.movie_index], True)
         self.display_next_movie()
 
     def dislike_movie(self):
         """Handle disliking a movie."""
+        if not self.is_movie_displayed():
+            return
         db.add_user_interest(self.id, self.movie_ids[self.movie_index], False)
         self.display_next_movie()
 
+    def is_movie_displayed(self):
+        """Return whether a movie card is currently shown."""
+        return self.movies is not None and 0 <= self.movie_index < len(self.movies)
+
+    def prefetch_movies(self):
+        """Load the next batch of movies in the background if the deck is running low."""
+        if self.movies is None:
+            self.movies = []
+            self.movie_ids = []
+        after_movie_id = self.movie_ids[-1] if self.movie_ids else 0
+        remaining = len(self.movies) - self.movie_index - 1
+        self.deck.request(self.id, after_movie_id, remaining)
+
+    def add_movies_to_deck(self, cards):
+        """Append a prefetched batch to the deck and show it if the user is waiting."""
+        self.movies += cards
+        self.movie_ids += [card["id"] for card in cards]
+        for card in cards:
+            self.images.request(card)
+        if self.waiting_for_movies:
+            self.waiting_for_movies = False
+            self.movie_index -= 1
+            self.display_next_movie()
+
+    def movies_failed(self):
+        """Handle a failed batch while the user is waiting for movies."""
+        if not self.waiting_for_movies:
+            return
+        self.waiting_for_movies = False
+        QMessageBox.warning(self, "Swiping", "Error fetching movies, please try again later")
+        self.switch_to_main_page()
+
     def display_next_movie(self):
-        """Display the next movie (placeholder)."""
-        self.movie_index += 1
-        if self.movies is None or len(self.movies) <= self.movie_index:
-            movies = db.get_movies_for_user(self.id)
-            if movies is None:
-                QMessageBox.warning(self, "Swiping", "Error fetching movies, please try again later")
-                self.switch_to_main_page()
-                return
-            self.movies = list(movies.values())
-            self.movie_ids = list(movies.keys())
-            self.movie_index = 0
+        """Display the next movie, or a loading state until the deck has been refilled."""
+        self.movie_index = max(self.movie_index + 1, 0)
+        self.prefetch_movies()
+        if len(self.movies) <= self.movie_index:
+            self.waiting_for_movies = True
+            self.movie_title_label.setText("Loading movies...")
+            self.movie_cover_label.setPixmap(QPixmap("../resources/placeholder_image.png"))
+            self.movie_release_date_label.setText("")
+            self.movie_genres_label.setText("")
+            return
         self.movie_title_label.setText(self.movies[self.movie_index]["title"])
 
-        # Load the image to QPixmap from blob
-        pixmap = QPixmap()
-        pixmap.loadFromData(QByteArray(self.movies[self.movie_index]["picture"]))
-        self.movie_cover_label.setPixmap(pixmap)
+        # Show the poster decoded in the background, or a placeholder until it is ready
+        self.show_poster(self.movie_cover_label, self.movies[self.movie_index])
 
         # Format date to German date format
         release_date = datetime.strptime(
@@ -457,19 +557,21 @@ class MovieTinder(QMainWindow):
 
     def view_match(self):
         """Handle viewing a match."""
-        selected_items = self.matches_list.selectedItems()
-        if not selected_items:
+        selected = self.matches_list.selectedIndexes()
+        if not selected:
             QMessageBox.warning(self, "No Selection", "No connection selected")
             return
 
-        self.selected_connection = self.connections[selected_items[0].text()]
-        matches = db.get_user_matches(self.id, self.selected_connection, 0)
-        if matches is None:
+        self.selected_connection = self.connections.connection_id(selected[0])
+        self.connections.clear_new_matches(self.selected_connection)
+        matches, self.match_page_token = db.get_user_matches_page(self.id, self.selected_connection)
+        if not matches:
             QMessageBox.warning(self, "Matches", "No matches with this user")
             self.switch_to_matches()
             return
-        self.matches = list(matches.values())
+        self.matches = [dict(movie, id=movie_id) for movie_id, movie in matches.items()]
         self.match_ids = list(matches.keys())
+        self.request_match_posters(matches)
         self.switch_to_match_details()
 
     def previous_match(self):
@@ -485,18 +587,19 @@ class MovieTinder(QMainWindow):
     def display_match(self):
         """Display the next match"""
         if len(self.matches) <= self.match_index:
-            matches = db.get_user_matches(self.id, self.selected_connection, self.match_ids[-1])
-            if matches is None:
+            if self.match_page_token is None:
                 QMessageBox.warning(self, "Matches", "No more Matches")
                 return
-            self.matches += list(matches.values())
-            self.match_ids = list(matches.keys())
+            matches, self.match_page_token = db.get_user_matches_page(
+                self.id, self.selected_connection, self.match_page_token
+            )
+            self.matches += [dict(movie, id=movie_id) for movie_id, movie in matches.items()]
+            self.match_ids += list(matches.keys())
+            self.request_match_posters(matches)
         self.match_movie_title_label.setText(self.matches[self.match_index]["title"])
 
-        # Load the image to QPixmap from blob
-        pixmap = QPixmap()
-        pixmap.loadFromData(QByteArray(self.matches[self.match_index]["picture"]))
-        self.match_movie_cover_label.setPixmap(pixmap)
+        # Show the poster decoded in the background, or a placeholder until it is ready
+        self.show_poster(self.match_movie_cover_label, self.matches[self.match_index])
 
         # Format date to German date format
         release_date = datetime.strptime(
@@ -506,10 +609,51 @@ class MovieTinder(QMainWindow):
 
         self.match_movie_genres_label.setText(f"Genres: {self.matches[self.match_index]['genres']}")
 
+    def request_match_posters(self, matches):
+        """Start decoding the thumbnails of a page of matches."""
+        for movie_id, movie in matches.items():
+            self.images.request(dict(movie, id=movie_id))
+
+    def show_poster(self, label, movie):
+        """
+        Show the best decoded variant of a movie's poster on a label.
+
+        The thumbnail (or the placeholder) is shown right away while the
+        display-size variant is loaded; poster_ready swaps it in.
+        """
+        self.images.request(movie, full=True)
+        pixmap = self.images.get(movie["id"])
+        if pixmap is None:
+            pixmap = QPixmap("../resources/placeholder_image.png")
+        label.setPixmap(pixmap)
+
+    def poster_ready(self, movie_id):
+        """Replace the placeholder once the poster of the shown movie has been decoded."""
+        current = self.main_layout.currentWidget()
+        if current is self.swiping_widget and self.is_movie_displayed() \
+                and self.movie_ids[self.movie_index] == movie_id:
+            self.show_poster(self.movie_cover_label, self.movies[self.movie_index])
+        elif current is self.match_details_widget and 0 <= self.match_index < len(self.match_ids) \
+                and self.match_ids[self.match_index] == movie_id:
+            self.show_poster(self.match_movie_cover_label, self.matches[self.match_index])
+
 
 if __name__ == "__main__":
-    db = Database()
+    startup = StartupTimer(['first_paint', 'database'], STARTED)
+    startup.mark('imports')
     app = QApplication(sys.argv)
     window = MovieTinder()
     window.show()
-    sys.exit(app.exec())
+    startup.mark('window')
+    QTimer.singleShot(0, lambda: startup.mark('first_paint'))
+
+    connector = DatabaseConnector(window)
+    connector.ready.connect(window.database_ready)
+    connector.ready.connect(lambda _: startup.mark('database'))
+    connector.failed.connect(window.database_failed)
+    connector.start()
+
+    exit_code = app.exec()
+    if db is not None:
+        db.close()
+    sys.exit(exit_code)
@@ -0,0 +1,99 @@
+import argparse
+from base import get_app_config
+from database import Database
+from catalog_sync import CatalogSync
+
+
+def migrate_posters(db, args):
+    """Drain the legacy movies.picture BLOB column into the poster store."""
+    migrated = db.migrate_posters(args.batch_size, args.drop_column)
+    if migrated == -1:
+        print("movies.picture does not exist, nothing to migrate")
+    else:
+        print(f"Migrated {migrated} posters")
+
+
+def rebuild_matches(db, args):
+    """Recompute the matches table from the recorded swipes."""
+    count = db.rebuild_matches(args.connection)
+    print(f"Stored {count} matches")
+
+
+def rebuild_friend_pending(db, args):
+    """Recompute the movies offered to users because their connections liked them."""
+    count = db.rebuild_friend_pending(args.connection)
+    print(f"Stored {count} pending movies")
+
+
+def backfill_genres(db, args):
+    """Store the genre mask and genre names on existing movie rows."""
+    count = db.backfill_movie_genres(args.batch_size)
+    print(f"Updated {count} movies")
+
+
+def sync_catalog(db, args):
+    """Bulk-load a range of TMDb discover pages, resuming from the checkpoint."""
+    sync = CatalogSync(db, args.checkpoint, args.rate, args.workers, args.batch_pages)
+    stored = sync.run(
+        args.first_page,
+        args.last_page,
+        lambda done, total, movies: print(f"{done}/{total} pages, {movies} new movies")
+    )
+    print(f"Stored {stored} new movies")
+
+
+def main():
+    """Parse the command line and run the requested maintenance command."""
+    parser = argparse.ArgumentParser(description="MovieTinder maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_posters = subparsers.add_parser(
+        "migrate-posters", help="move poster BLOBs from the movies table into the poster store"
+    )
+    parser_posters.add_argument("--batch-size", type=int, default=100)
+    parser_posters.add_argument("--drop-column", action="store_true",
+                                help="drop movies.picture after migrating")
+    parser_posters.set_defaults(handler=migrate_posters)
+
+    parser_matches = subparsers.add_parser(
+        "rebuild-matches", help="recompute the matches table from movie_user_interests"
+    )
+    parser_matches.add_argument("--connection", type=int, default=None,
+                                help="only rebuild the matches of this connection")
+    parser_matches.set_defaults(handler=rebuild_matches)
+
+    parser_friends = subparsers.add_parser(
+        "rebuild-friend-pending", help="recompute friend_pending from movie_user_interests"
+    )
+    parser_friends.add_argument("--connection", type=int, default=None,
+                                help="only add the movies of this connection")
+    parser_friends.set_defaults(handler=rebuild_friend_pending)
+
+    parser_genres = subparsers.add_parser(
+        "backfill-genres", help="store genre_mask and genres on existing movie rows"
+    )
+    parser_genres.add_argument("--batch-size", type=int, default=1000)
+    parser_genres.set_defaults(handler=backfill_genres)
+
+    sync_config = get_app_config().get('CatalogSync', {})
+    parser_sync = subparsers.add_parser(
+        "sync-catalog", help="bulk-load a range of TMDb discover pages"
+    )
+    parser_sync.add_argument("first_page", type=int)
+    parser_sync.add_argument("last_page", type=int)
+    parser_sync.add_argument("--rate", type=float, default=sync_config.get('RequestsPerSecond', 40),
+                             help="maximum TMDb requests per second")
+    parser_sync.add_argument("--workers", type=int, default=sync_config.get('Workers', 8))
+    parser_sync.add_argument("--batch-pages", type=int, default=sync_config.get('BatchPages', 10),
+                             help="pages stored per transaction")
+    parser_sync.add_argument("--checkpoint", default=sync_config.get('Checkpoint', '../catalog_sync.json'))
+    parser_sync.set_defaults(handler=sync_catalog)
+
+    args = parser.parse_args()
+    db = Database()
+    args.handler(db, args)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
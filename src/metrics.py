@@ -0,0 +1,348 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from base import get_app_config
+
+# Upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger('movietinder.metrics')
+
+
+class Series:
+    """Latency histogram and counters of one instrumented operation."""
+
+    def __init__(self):
+        """Initialize an empty Series."""
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def observe(self, seconds, rows=0, size=0, failed=False):
+        """
+        Record one call.
+
+        Args:
+            seconds (float): The duration of the call.
+            rows (int, optional): Number of rows the call returned or wrote. Defaults to 0.
+            size (int, optional): Number of bytes the call returned or transferred. Defaults to 0.
+            failed (bool, optional): Whether the call raised an exception. Defaults to False.
+        """
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.rows += rows
+        self.bytes += size
+        self.errors += failed
+
+    def snapshot(self):
+        """
+        Return the series as a dictionary.
+
+        Returns:
+            dict: The cumulative bucket counts keyed by upper bound, and the counters.
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(BUCKETS + ('+Inf',), self.buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'buckets': buckets
+        }
+
+
+class TimedCursor:
+    """
+    Wraps a database cursor and times every statement it executes.
+
+    Statements slower than the slow-query threshold are written to the slow log
+    together with their SQL text.
+    """
+
+    def __init__(self, cursor, registry):
+        """
+        Initialize the TimedCursor.
+
+        Args:
+            cursor: The cursor of the storage backend.
+            registry (Metrics): The registry the timings are recorded in.
+        """
+        self.cursor = cursor
+        self.registry = registry
+
+    def __run(self, method, sql_command, params):
+        """Run execute or executemany and record the statement."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(sql_command, params)
+            failed = False
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            statement = ' '.join(sql_command.split())
+            self.registry.observe('sql', statement.split(' ', 1)[0].upper(), seconds, failed=failed,
+                                  detail=statement)
+
+    def execute(self, sql_command, params=()):
+        """Execute and time a statement."""
+        return self.__run(self.cursor.execute, sql_command, params)
+
+    def executemany(self, sql_command, seq_of_params):
+        """Execute and time a statement for every parameter set."""
+        return self.__run(self.cursor.executemany, sql_command, seq_of_params)
+
+    def __iter__(self):
+        """Iterate over the remaining rows."""
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        """Delegate everything else to the wrapped cursor."""
+        return getattr(self.cursor, name)
+
+
+class Metrics:
+    """
+    Registry of latency histograms, row and byte counters and a slow log.
+
+    Operations are grouped into families such as 'database', 'sql', 'api' and
+    'image'. Cache statistics are pulled from registered collectors when the
+    metrics are exported. While disabled, instrumented calls only check the
+    `enabled` flag.
+    """
+
+    def __init__(self, enabled=False, slow_threshold=0.25, slow_log_size=200, path=None):
+        """
+        Initialize the Metrics registry.
+
+        Args:
+            enabled (bool, optional): Whether calls are recorded. Defaults to False.
+            slow_threshold (float, optional): Seconds after which a call is written to the slow log.
+                Defaults to 0.25.
+            slow_log_size (int, optional): Number of slow calls kept for export. Defaults to 200.
+            path (str, optional): Directory written by dump. Defaults to None.
+        """
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.path = path
+        self.series = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.collectors = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Create the registry from the 'Metrics' settings.
+
+        Returns:
+            Metrics: The configured registry.
+        """
+        config = get_app_config().get('Metrics', {})
+        return cls(
+            config.get('Enabled', False),
+            config.get('SlowThreshold', 0.25),
+            config.get('SlowLogSize', 200),
+            config.get('Path', '../metrics')
+        )
+
+    def observe(self, family, operation, seconds, rows=0, size=0, failed=False, detail=None):
+        """
+        Record one call of an operation.
+
+        Args:
+            family (str): The group of the operation, e.g. 'database'.
+            operation (str): The name of the operation, e.g. a method or endpoint.
+            seconds (float): The duration of the call.
+            rows (int, optional): Number of rows the call returned or wrote. Defaults to 0.
+            size (int, optional): Number of bytes the call returned or transferred. Defaults to 0.
+            failed (bool, optional): Whether the call failed. Defaults to False.
+            detail (str, optional): Shown in the slow log instead of the operation, e.g. the SQL text.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            series = self.series.get((family, operation))
+            if series is None:
+                series = self.series[(family, operation)] = Series()
+            series.observe(seconds, rows, size, failed)
+            if seconds >= self.slow_threshold:
+                self.slow_log.append({
+                    'time': time.time(),
+                    'family': family,
+                    'operation': operation,
+                    'seconds': seconds,
+                    'detail': detail
+                })
+        if seconds >= self.slow_threshold:
+            logger.warning("slow %s %s: %.1f ms %s", family, operation, seconds * 1000, detail or '')
+
+    def timed(self, family, operation=None):
+        """
+        Decorate a function so every call is timed.
+
+        Rows are counted for dict and list results and bytes for bytes results.
+
+        Args:
+            family (str): The group of the operation, e.g. 'database'.
+            operation (str, optional): The name of the operation. Defaults to the function name.
+
+        Returns:
+            callable: The decorator.
+        """
+        def decorator(func):
+            name = operation or func.__name__.lstrip('_')
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                failed = True
+                result = None
+                try:
+                    result = func(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    rows = len(result) if isinstance(result, (dict, list)) else 0
+                    size = len(result) if isinstance(result, bytes) else 0
+                    self.observe(family, name, time.perf_counter() - start, rows, size, failed)
+            return wrapper
+        return decorator
+
+    def wrap_cursor(self, cursor):
+        """
+        Return a cursor that times its statements while metrics are enabled.
+
+        Args:
+            cursor: The cursor of the storage backend.
+
+        Returns:
+            The cursor itself if metrics are disabled, a TimedCursor otherwise.
+        """
+        if not self.enabled:
+            return cursor
+        return TimedCursor(cursor, self)
+
+    def add_collector(self, name, label, collect):
+        """
+        Register a source of gauges that is read when the metrics are exported.
+
+        Args:
+            name (str): The name of the source, e.g. 'http_cache'.
+            label (str): The label the values are keyed by, e.g. 'endpoint'.
+            collect (callable): Returns a dict of label values to dicts of gauge values.
+        """
+        with self.lock:
+            self.collectors[name] = (label, collect)
+
+    def reset(self):
+        """Drop all recorded calls and the slow log."""
+        with self.lock:
+            self.series = {}
+            self.slow_log.clear()
+
+    def __collect(self):
+        """Read all collectors, skipping those that fail."""
+        with self.lock:
+            collectors = dict(self.collectors)
+        gauges = {}
+        for name, (label, collect) in collectors.items():
+            try:
+                gauges[name] = (label, collect())
+            except Exception:
+                logger.exception("metrics collector %s failed", name)
+        return gauges
+
+    def snapshot(self):
+        """
+        Return all metrics as a JSON-serialisable dictionary.
+
+        Returns:
+            dict: The series per family and operation, the collector gauges and the slow log.
+        """
+        with self.lock:
+            families = {}
+            for (family, operation), series in sorted(self.series.items()):
+                families.setdefault(family, {})[operation] = series.snapshot()
+            slow_log = list(self.slow_log)
+        gauges = {name: values for name, (_, values) in self.__collect().items()}
+        return {
+            'time': time.time(),
+            'slow_threshold': self.slow_threshold,
+            'families': families,
+            'gauges': gauges,
+            'slow_log': slow_log
+        }
+
+    def prometheus(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines = []
+        snapshot = self.snapshot()
+        for family, operations in snapshot['families'].items():
+            metric = f"movietinder_{family}"
+            lines.append(f"# TYPE {metric}_seconds histogram")
+            for operation, series in operations.items():
+                for bound, count in series['buckets'].items():
+                    lines.append(f'{metric}_seconds_bucket{{operation="{operation}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_seconds_sum{{operation="{operation}"}} {series["sum"]}')
+                lines.append(f'{metric}_seconds_count{{operation="{operation}"}} {series["count"]}')
+            for counter in ('rows', 'bytes', 'errors'):
+                lines.append(f"# TYPE {metric}_{counter}_total counter")
+                for operation, series in operations.items():
+                    lines.append(f'{metric}_{counter}_total{{operation="{operation}"}} {series[counter]}')
+
+        for name, (label, values) in self.__collect().items():
+            gauges = {}
+            for label_value, fields in values.items():
+                for field, value in fields.items():
+                    if isinstance(value, (int, float)):
+                        gauges.setdefault(field, []).append((label_value, value))
+            for field, samples in gauges.items():
+                metric = f"movietinder_{name}_{field}"
+                lines.append(f"# TYPE {metric} gauge")
+                for label_value, value in samples:
+                    lines.append(f'{metric}{{{label}="{label_value}"}} {value}')
+
+        lines.append("# TYPE movietinder_slow_calls gauge")
+        lines.append(f"movietinder_slow_calls {len(snapshot['slow_log'])}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path=None):
+        """
+        Write metrics.json and metrics.prom into a directory.
+
+        Args:
+            path (str, optional): The directory. Defaults to the 'Metrics.Path' setting.
+        """
+        path = path or self.path
+        if not self.enabled or not path:
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'metrics.json'), 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+        with open(os.path.join(path, 'metrics.prom'), 'w') as file:
+            file.write(self.prometheus())
+
+
+metrics = Metrics.from_config()
@@ -0,0 +1,42 @@
+import base64
+import json
+
+
+def encode_token(kind, key):
+    """
+    Encode the position after the last row of a page as an opaque continuation token.
+
+    Args:
+        kind (str): What is paged, e.g. 'connections'; a token is only valid for the same kind.
+        key (list): The keyset of the last row, e.g. [connection ID].
+
+    Returns:
+        str: A URL-safe token.
+    """
+    return base64.urlsafe_b64encode(json.dumps([kind, key]).encode()).decode().rstrip('=')
+
+
+def decode_token(kind, token, length):
+    """
+    Decode a continuation token created by encode_token.
+
+    Args:
+        kind (str): What is paged.
+        token (str): The token.
+        length (int): The number of values in the keyset of this kind of page.
+
+    Returns:
+        list: The keyset of the last row of the previous page.
+
+    Raises:
+        ValueError: If the token is malformed or belongs to another kind of page.
+    """
+    try:
+        token_kind, key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid page token")
+    if token_kind != kind or not isinstance(key, list) or len(key) != length:
+        raise ValueError("invalid page token")
+    if not all(isinstance(value, int) for value in key):
+        raise ValueError("invalid page token")
+    return key
@@ -0,0 +1,101 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of database connections.
+
+    At most `size` connections exist at any time. Connections are opened on
+    demand, checked with `check` on every checkout and replaced transparently
+    when they have been dropped.
+    """
+
+    def __init__(self, connect, check, size=5, timeout=30):
+        """
+        Initialize the ConnectionPool.
+
+        Args:
+            connect (callable): Opens and returns a new connection.
+            check (callable): Returns True if the given connection is still usable.
+            size (int, optional): The maximum number of connections. Defaults to 5.
+            timeout (float, optional): Seconds to wait for a free connection. Defaults to 30.
+        """
+        self.connect = connect
+        self.check = check
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def __checkout(self):
+        """
+        Take a healthy connection from the pool, opening one if necessary.
+
+        Returns:
+            The checked out connection.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(f"no database connection available after {self.timeout}s")
+
+        try:
+            while True:
+                try:
+                    connection = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if self.check(connection):
+                    return connection
+                self.__discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    @staticmethod
+    def __discard(connection):
+        """Close a connection that is no longer usable, ignoring errors."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a with block.
+
+        Connections that raised an error are discarded instead of being
+        returned to the pool, so a broken connection is never reused. A
+        generator closed early inside the block, such as Database.stream,
+        returns its connection like a normal exit.
+
+        Yields:
+            The checked out connection.
+        """
+        connection = self.__checkout()
+        try:
+            yield connection
+        except GeneratorExit:
+            self.idle.put(connection)
+            self.slots.release()
+            raise
+        except BaseException:
+            self.__discard(connection)
+            self.slots.release()
+            raise
+        self.idle.put(connection)
+        self.slots.release()
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self.__discard(connection)
@@ -0,0 +1,187 @@
+import hashlib
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from base import get_app_config
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+class PosterStore:
+    """
+    A content-addressed store for poster images.
+
+    Images are appended to a single pack file and addressed by the SHA-256
+    digest of their content. An index file next to the pack maps every digest
+    to its offset and length, and reads are served from a memory map of the pack.
+    The index can also map aliases, such as a poster path in a given size, to digests.
+
+    Several processes may share a store, e.g. the app and manage.py sync-catalog.
+    Appends to the pack and the index are serialized across processes by a
+    lock file, so every index entry records where its bytes really are.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize the PosterStore and load its index.
+
+        Args:
+            path (str, optional): Directory holding the pack and index files.
+                Defaults to the 'PosterStore.Path' setting or '../posters'.
+        """
+        if path is None:
+            path = get_app_config().get('PosterStore', {}).get('Path', '../posters')
+        os.makedirs(path, exist_ok=True)
+        self.pack_path = os.path.join(path, 'posters.pack')
+        self.index_path = os.path.join(path, 'posters.idx')
+        self.lock_path = os.path.join(path, 'posters.lock')
+        self.index = {}
+        self.aliases = {}
+        self.lock = threading.Lock()
+        self.__index_offset = 0
+        self.__map = None
+        self.__map_size = 0
+        with self.lock:
+            self.__load_index()
+
+    def __load_index(self):
+        """
+        Read index entries appended since the last call.
+
+        Other processes may share the store, so unknown digests trigger a reload
+        of the index tail instead of a full rescan.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r') as file:
+            file.seek(self.__index_offset)
+            for line in file:
+                if not line.endswith('\n'):
+                    # Entry is still being written by another process
+                    break
+                if line.startswith('@'):
+                    alias, digest = line[1:].split()
+                    self.aliases[alias] = digest
+                else:
+                    digest, offset, length = line.split()
+                    self.index[digest] = (int(offset), int(length))
+                self.__index_offset += len(line)
+
+    @contextmanager
+    def __file_lock(self):
+        """Hold the lock file that serializes writes of all processes sharing the store."""
+        with open(self.lock_path, 'a+b') as file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after about 10 seconds, keep waiting
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def __remap(self, required_size):
+        """
+        Make sure the memory map covers at least required_size bytes of the pack.
+
+        Args:
+            required_size (int): The number of bytes that must be mapped.
+        """
+        if self.__map is not None and self.__map_size >= required_size:
+            return
+        if self.__map is not None:
+            self.__map.close()
+        with open(self.pack_path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__map_size = len(self.__map)
+
+    def put(self, data, alias=None):
+        """
+        Store image bytes and return their reference.
+
+        Args:
+            data (bytes): The image content.
+            alias (str, optional): A name that resolves to the stored image. Must not contain whitespace.
+
+        Returns:
+            str: The hex digest referencing the image, or None if data is empty.
+        """
+        if not data:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if digest in self.index and (alias is None or self.aliases.get(alias) == digest):
+                return digest
+            with self.__file_lock():
+                # Another process may have stored the same image in the meantime
+                self.__load_index()
+                if digest not in self.index:
+                    with open(self.pack_path, 'ab') as file:
+                        file.seek(0, os.SEEK_END)
+                        offset = file.tell()
+                        file.write(data)
+                    with open(self.index_path, 'a') as file:
+                        file.write(f"{digest} {offset} {len(data)}\n")
+                    self.index[digest] = (offset, len(data))
+                if alias is not None and self.aliases.get(alias) != digest:
+                    with open(self.index_path, 'a') as file:
+                        file.write(f"@{alias} {digest}\n")
+                    self.aliases[alias] = digest
+        return digest
+
+    def resolve(self, alias):
+        """
+        Return the digest an alias points to.
+
+        Args:
+            alias (str): The alias passed to put.
+
+        Returns:
+            str: The hex digest, or None if the alias is unknown.
+        """
+        with self.lock:
+            if alias not in self.aliases:
+                self.__load_index()
+            return self.aliases.get(alias)
+
+    def get(self, digest):
+        """
+        Load image bytes by their reference.
+
+        Args:
+            digest (str): The hex digest returned by put.
+
+        Returns:
+            bytes: The image content, or None if the reference is unknown.
+        """
+        if not digest:
+            return None
+        with self.lock:
+            if digest not in self.index:
+                self.__load_index()
+            if digest not in self.index:
+                return None
+            offset, length = self.index[digest]
+            self.__remap(offset + length)
+            return self.__map[offset:offset + length]
+
+    def __contains__(self, digest):
+        """Return whether the store holds the given reference."""
+        with self.lock:
+            return digest in self.index
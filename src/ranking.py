@@ -0,0 +1,295 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+GENRE_BITS = np.arange(64, dtype=np.uint64)
+
+
+def genre_matrix(masks):
+    """
+    Expand genre masks into one row of genre indicators per movie.
+
+    Args:
+        masks (list): The movies' genre_mask values, see genre_bit.
+
+    Returns:
+        np.ndarray: A float32 matrix of shape (len(masks), 64) with 1 where a movie has the genre.
+    """
+    # genre_mask is a signed 64-bit column, the bits are read as unsigned
+    masks = np.array([mask & 0xFFFFFFFFFFFFFFFF for mask in masks], dtype=np.uint64)
+    return ((masks[:, None] >> GENRE_BITS) & np.uint64(1)).astype(np.float32)
+
+
+class UserDeck:
+    """The ranking state of one user."""
+
+    def __init__(self, affinity, seen):
+        """
+        Initialize the UserDeck.
+
+        Args:
+            affinity (np.ndarray): The user's weight for each of the 64 genre bits.
+            seen (set): The IDs of the movies the user has swiped.
+        """
+        self.affinity = affinity
+        self.seen = seen
+        self.served = set()
+        self.queue = np.empty(0, dtype=np.int64)
+        self.position = 0
+        self.unqueued = 0
+        self.swipes_since_rank = 0
+        self.ranked_movies = -1
+        self.friend_after = 0
+
+
+class DeckRanker:
+    """
+    Orders each user's deck by how well the movies' genres fit the user's swipes.
+
+    A user's genre affinity is the sum of the genre indicators of the liked
+    movies minus the weighted sum of the disliked ones. All movies the user has
+    not seen are scored against it in one matrix product and the queue_size
+    best are kept as a ranked queue, so serving cards is a pop from the queue
+    and a user's memory does not grow with the catalog. Only the max_users
+    most recently served users are kept, the others are loaded again when
+    they come back. New swipes are read from movie_user_interests since the
+    last refresh and added to the affinities; row IDs can commit out of order,
+    so the last `window` IDs before the refresh mark are read again and rows
+    already applied are skipped. The queue is ranked again after rerank_every
+    swipes, when new movies were stored or when it runs out. Ties, e.g. for a
+    user without swipes, keep the movie ID order.
+
+    Movies the user's connections liked but the user has not swiped are
+    kept in friend_pending as the likes are written. Up to friend_slots of
+    every batch are taken from there before the ranked queue, since each
+    of them can become a match with the next swipe.
+    """
+
+    def __init__(self, db, rerank_every=8, dislike_weight=0.5, friend_slots=4, queue_size=64,
+                 max_users=1000, window=100):
+        """
+        Initialize the DeckRanker.
+
+        Args:
+            db (Database): The database to load the movies and swipes from.
+            rerank_every (int, optional): Number of swipes after which a queue is ranked again. Defaults to 8.
+            dislike_weight (float, optional): Weight of a dislike relative to a like. Defaults to 0.5.
+            friend_slots (int, optional): Maximum number of movies per batch taken from
+                friend_pending. Defaults to 4.
+            queue_size (int, optional): Number of best ranked movies kept per user. Defaults to 64.
+            max_users (int, optional): Number of users whose ranking state is kept. Defaults to 1000.
+            window (int, optional): Number of swipe IDs below the refresh mark read again. Defaults to 100.
+        """
+        self.db = db
+        self.rerank_every = rerank_every
+        self.dislike_weight = dislike_weight
+        self.friend_slots = friend_slots
+        self.queue_size = queue_size
+        self.max_users = max_users
+        self.window = window
+        self.movie_ids = np.empty(0, dtype=np.int64)
+        self.genres = np.empty((0, 64), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.lowest_page = None
+        self.users = OrderedDict()
+        self.last_id = None
+        self.applied = set()
+        self.lock = threading.Lock()
+
+    def __load_movies(self):
+        """Add the movies stored since the last call to the catalog."""
+        last_movie_id = int(self.movie_ids[-1]) if len(self.movie_ids) else 0
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT id, genre_mask, page FROM movies WHERE id > %s ORDER BY id", (last_movie_id,))
+            rows = cursor.fetchall()
+        if not rows:
+            return
+
+        movie_ids, masks, pages = zip(*rows)
+        genres = genre_matrix(masks)
+        counts = genres.sum(axis=1)
+        # Movies with many genres would otherwise outscore movies that fit the user better
+        norms = np.where(counts > 0, 1 / np.sqrt(np.maximum(counts, 1)), 0).astype(np.float32)
+        self.movie_ids = np.concatenate([self.movie_ids, np.array(movie_ids, dtype=np.int64)])
+        self.genres = np.concatenate([self.genres, genres])
+        self.norms = np.concatenate([self.norms, norms])
+        lowest_page = min(pages)
+        self.lowest_page = lowest_page if self.lowest_page is None else min(self.lowest_page, lowest_page)
+
+    def __rows(self, movie_ids):
+        """
+        Look up the catalog rows of movies.
+
+        Args:
+            movie_ids (list): The IDs of the movies.
+
+        Returns:
+            np.ndarray: The row of each movie, or -1 for movies not in the catalog.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        rows = np.searchsorted(self.movie_ids, movie_ids)
+        found = rows < len(self.movie_ids)
+        found[found] = self.movie_ids[rows[found]] == movie_ids[found]
+        return np.where(found, rows, -1)
+
+    def __weights(self, liked):
+        """Return the affinity weight of each swipe, 1 for likes and -dislike_weight for dislikes."""
+        return np.where(np.asarray(liked, dtype=bool), 1.0, -self.dislike_weight).astype(np.float32)
+
+    def __refresh_swipes(self):
+        """Apply the swipes recorded since the last refresh to the loaded users."""
+        with self.db.cursor() as cursor:
+            if self.last_id is None:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM movie_user_interests")
+                self.last_id = cursor.fetchone()[0]
+                return
+            cursor.execute(
+                "SELECT id, user, movie, liked FROM movie_user_interests WHERE id > %s ORDER BY id",
+                (max(self.last_id - self.window, 0),)
+            )
+            rows = [row for row in cursor.fetchall() if row[0] not in self.applied]
+        if rows:
+            self.last_id = max(self.last_id, rows[-1][0])
+            self.applied.update(row[0] for row in rows)
+        self.applied = {row_id for row_id in self.applied if row_id > self.last_id - self.window}
+
+        rows = [row for row in rows if row[1] in self.users]
+        if not rows:
+            return
+        _, user_ids, movie_ids, liked = zip(*rows)
+        catalog_rows = self.__rows(movie_ids)
+        weights = self.__weights(liked)
+        for user_id, movie_id, catalog_row, weight in zip(user_ids, movie_ids, catalog_rows, weights):
+            user = self.users[user_id]
+            user.seen.add(movie_id)
+            user.served.discard(movie_id)
+            user.swipes_since_rank += 1
+            if catalog_row != -1:
+                user.affinity += weight * self.genres[catalog_row]
+
+    def __load_user(self, user_id):
+        """
+        Build the affinity of a user from all of their swipes.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            UserDeck: The user's ranking state.
+        """
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT id, movie, liked FROM movie_user_interests WHERE user = %s", (user_id,))
+            rows = cursor.fetchall()
+
+        # Swipes in the refresh window are in the affinity now and must not be added again
+        self.applied.update(row[0] for row in rows if row[0] > self.last_id - self.window)
+        affinity = np.zeros(64, dtype=np.float32)
+        if rows:
+            _, movie_ids, liked = zip(*rows)
+            catalog_rows = self.__rows(movie_ids)
+            found = catalog_rows != -1
+            affinity = self.__weights(liked)[found] @ self.genres[catalog_rows[found]]
+        user = UserDeck(affinity, {row[1] for row in rows})
+        self.users[user_id] = user
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+        return user
+
+    def __rank(self, user):
+        """
+        Score all movies the user has neither swiped nor been served and queue the best ones first.
+
+        Args:
+            user (UserDeck): The user's ranking state.
+        """
+        excluded = np.fromiter(user.seen | user.served, dtype=np.int64)
+        candidates = ~np.isin(self.movie_ids, excluded)
+        movie_ids = self.movie_ids[candidates]
+        scores = (self.genres[candidates] @ user.affinity) * self.norms[candidates]
+        if len(movie_ids) > self.queue_size:
+            # Select the queue_size best without sorting the catalog; movie_ids
+            # is in ID order, so ties at the cut keep the lowest IDs
+            threshold = scores[np.argpartition(-scores, self.queue_size - 1)[self.queue_size - 1]]
+            above = np.flatnonzero(scores > threshold)
+            ties = np.flatnonzero(scores == threshold)[:self.queue_size - len(above)]
+            best = np.concatenate([above, ties])
+            movie_ids, scores = movie_ids[best], scores[best]
+        user.queue = movie_ids[np.lexsort((movie_ids, -scores))]
+        user.unqueued = int(candidates.sum()) - len(user.queue)
+        user.position = 0
+        user.swipes_since_rank = 0
+        user.ranked_movies = len(self.movie_ids)
+
+    def __friend_movies(self, user_id, user, limit):
+        """
+        Read the next movies liked by the user's connections.
+
+        friend_pending is read by its row ID after the last row already dealt,
+        so each call is one index seek however many movies are pending.
+
+        Args:
+            user_id (int): The ID of the user.
+            user (UserDeck): The user's ranking state.
+            limit (int): The maximum number of rows to read.
+
+        Returns:
+            list: The IDs of the movies.
+        """
+        with self.db.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, movie FROM friend_pending WHERE user = %s AND id > %s ORDER BY id LIMIT %s",
+                (user_id, user.friend_after, limit)
+            )
+            rows = cursor.fetchall()
+        if rows:
+            user.friend_after = rows[-1][0]
+        return [movie_id for _, movie_id in rows]
+
+    def next_movies(self, user_id, limit, restart=False):
+        """
+        Take the next movies from a user's ranked queue.
+
+        Movies from friend_pending come first, then the best ranked ones. Served
+        movies are not offered again until the user starts a new deck.
+
+        Args:
+            user_id (int): The ID of the user.
+            limit (int): The maximum number of movies to return.
+            restart (bool, optional): Whether the user starts a new deck, which offers
+                served but not swiped movies again. Defaults to False.
+
+        Returns:
+            tuple: The IDs of the movies, best first, and the number of unseen movies left to rank.
+        """
+        with self.lock:
+            self.__load_movies()
+            self.__refresh_swipes()
+            user = self.users.get(user_id)
+            if user is None:
+                user = self.__load_user(user_id)
+            else:
+                self.users.move_to_end(user_id)
+            if restart:
+                user.served.clear()
+                user.friend_after = 0
+            if restart or user.swipes_since_rank >= self.rerank_every or user.ranked_movies < len(self.movie_ids):
+                self.__rank(user)
+
+            movie_ids = []
+            for movie_id in self.__friend_movies(user_id, user, min(self.friend_slots, limit)):
+                if movie_id not in user.seen and movie_id not in user.served:
+                    user.served.add(movie_id)
+                    movie_ids.append(movie_id)
+            while len(movie_ids) < limit:
+                if user.position >= len(user.queue):
+                    if not user.unqueued:
+                        break
+                    self.__rank(user)
+                    continue
+                movie_id = int(user.queue[user.position])
+                user.position += 1
+                if movie_id in user.seen or movie_id in user.served:
+                    continue
+                user.served.add(movie_id)
+                movie_ids.append(movie_id)
+            return movie_ids, len(user.queue) - user.position + user.unqueued
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import functools
+import json
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from base import get_app_config
+from database import Database
+
+# Dates and other non-JSON column values are sent as strings
+dumps = functools.partial(json.dumps, default=str)
+
+
+class SwipeService:
+    """
+    Serves the Database operations of the desktop client over HTTP/JSON.
+
+    One service holds the connection pool, the swipe buffer and the in-memory
+    caches for all clients, so swipes of many users are written in shared
+    batches. Database calls block, so they run on a bounded thread pool while
+    the event loop keeps serving other clients.
+
+    Clients log in with POST /login and send the returned token as
+    'Authorization: Bearer <token>'. Every user-scoped request must name the
+    user the token belongs to.
+    """
+
+    def __init__(self, db, workers=8):
+        """
+        Initialize the SwipeService.
+
+        Args:
+            db (Database): The database serving all clients.
+            workers (int, optional): Number of Database calls run at the same time. Defaults to 8.
+        """
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='service')
+        self.sessions = {}
+
+    async def call(self, method, *args, **kwargs):
+        """
+        Run a Database method on the worker pool.
+
+        Args:
+            method (callable): The bound Database method.
+            *args: Positional arguments of the method.
+            **kwargs: Keyword arguments of the method.
+
+        Returns:
+            The result of the method.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    def authenticate(self, request):
+        """
+        Return the user the request's session token belongs to.
+
+        Args:
+            request (web.Request): The request.
+
+        Returns:
+            int: The ID of the logged-in user.
+
+        Raises:
+            web.HTTPUnauthorized: If the token is missing or unknown.
+        """
+        header = request.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else None
+        if token not in self.sessions:
+            raise web.HTTPUnauthorized()
+        return self.sessions[token]
+
+    def authorize(self, request, user_id):
+        """
+        Check that the request's session token belongs to the given user.
+
+        Args:
+            request (web.Request): The request.
+            user_id (int): The user the request acts for.
+
+        Raises:
+            web.HTTPUnauthorized: If the token is missing or unknown.
+            web.HTTPForbidden: If the token belongs to another user.
+        """
+        if self.authenticate(request) != user_id:
+            raise web.HTTPForbidden()
+
+    @staticmethod
+    def reply(data):
+        """Return a JSON response."""
+        return web.json_response(data, dumps=dumps)
+
+    @staticmethod
+    def int_query(request, name, default=None):
+        """
+        Read an integer query parameter.
+
+        Raises:
+            web.HTTPBadRequest: If the parameter is missing without default or not an integer.
+        """
+        value = request.query.get(name)
+        if value is None:
+            if default is None:
+                raise web.HTTPBadRequest(text=f"missing {name}")
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise web.HTTPBadRequest(text=f"invalid {name}")
+
+    async def login(self, request):
+        """POST /login {email, password} -> {user_id, token}; user_id is -1 on failure."""
+        body = await request.json()
+        user_id = await self.call(self.db.try_login, body['email'], body['password'])
+        token = None
+        if user_id != -1:
+            token = secrets.token_urlsafe(32)
+            self.sessions[token] = user_id
+        return self.reply({'user_id': user_id, 'token': token})
+
+    async def sign_up(self, request):
+        """POST /signup {email, password} -> {ok}."""
+        body = await request.json()
+        return self.reply({'ok': await self.call(self.db.sign_up, body['email'], body['password'])})
+
+    async def create_connection_request(self, request):
+        """POST /connections {user_id, email} -> {ok}."""
+        body = await request.json()
+        self.authorize(request, body['user_id'])
+        ok = await self.call(self.db.create_connection_request, body['user_id'], body['email'])
+        return self.reply({'ok': ok})
+
+    async def get_users_connections(self, request):
+        """GET /connections?user_id=&pending=&after=&limit= -> {connection ID: email}."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        pending = request.query.get('pending') == '1'
+        limit = request.query.get('limit')
+        connections = await self.call(
+            self.db.get_users_connections, user_id, pending,
+            self.int_query(request, 'after', 0), int(limit) if limit else None
+        )
+        return self.reply(connections)
+
+    async def get_users_connections_page(self, request):
+        """GET /connections/page?user_id=&pending=&token=&limit= -> {connections, next}."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        pending = request.query.get('pending') == '1'
+        try:
+            connections, next_token = await self.call(
+                self.db.get_users_connections_page, user_id, pending,
+                request.query.get('token'), min(self.int_query(request, 'limit', 50), 500)
+            )
+        except ValueError as error:
+            raise web.HTTPBadRequest(text=str(error))
+        return self.reply({'connections': connections, 'next': next_token})
+
+    async def accept_connection(self, request):
+        """POST /connections/{id}/accept {user_id} -> {ok}; only the receiver may accept."""
+        body = await request.json()
+        self.authorize(request, body['user_id'])
+        connection_id = int(request.match_info['id'])
+        pending = await self.call(self.db.get_users_connections, body['user_id'], True)
+        if connection_id not in pending:
+            raise web.HTTPForbidden()
+        return self.reply({'ok': await self.call(self.db.accept_connection, connection_id)})
+
+    async def get_other_user_from_connection(self, request):
+        """GET /connections/{id}/other?user_id= -> {user_id}; only the two users of the connection may ask."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        connection_id = int(request.match_info['id'])
+        other = await self.call(self.db.get_other_user_from_connection, user_id, connection_id)
+        if other == -1:
+            raise web.HTTPForbidden()
+        return self.reply({'user_id': other})
+
+    async def get_user_matches(self, request):
+        """GET /connections/{id}/matches?user_id=&after=&limit= -> {movie ID: movie} or null."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        connection_id = int(request.match_info['id'])
+        after = self.int_query(request, 'after', 0)
+        limit = min(self.int_query(request, 'limit', 20), 500)
+        return self.reply(await self.call(self.db.get_user_matches, user_id, connection_id, after, limit))
+
+    async def get_user_matches_page(self, request):
+        """GET /connections/{id}/matches/page?user_id=&token=&limit= -> {movies, next}."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        try:
+            movies, next_token = await self.call(
+                self.db.get_user_matches_page, user_id, int(request.match_info['id']),
+                request.query.get('token'), min(self.int_query(request, 'limit', 20), 500)
+            )
+        except ValueError as error:
+            raise web.HTTPBadRequest(text=str(error))
+        return self.reply({'movies': movies, 'next': next_token})
+
+    async def get_change_marks(self, request):
+        """GET /changes/marks -> {event_id, match_id}."""
+        self.authenticate(request)
+        event_id, match_id = await self.call(self.db.get_change_marks)
+        return self.reply({'event_id': event_id, 'match_id': match_id})
+
+    async def get_changes(self, request):
+        """GET /changes?user_id=&after_event=&after_match= -> see Database.get_changes."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        changes = await self.call(
+            self.db.get_changes, user_id,
+            self.int_query(request, 'after_event'), self.int_query(request, 'after_match')
+        )
+        return self.reply(changes)
+
+    async def get_movies_for_user(self, request):
+        """GET /deck?user_id=&after=&limit= -> {movie ID: movie} or null."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        movies = await self.call(
+            self.db.get_movies_for_user, user_id,
+            after_movie_id=self.int_query(request, 'after', 0),
+            limit=min(self.int_query(request, 'limit', 8), 100)
+        )
+        return self.reply(movies)
+
+    async def add_user_interests(self, request):
+        """POST /swipes {user_id, swipes: [[movie ID, liked], ...]} -> {ok}; 400 for unknown movies."""
+        body = await request.json()
+        self.authorize(request, body['user_id'])
+        try:
+            swipes = [(int(movie_id), bool(is_liked)) for movie_id, is_liked in body['swipes']]
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text="invalid swipes")
+        # The swipe buffer is shared by all clients, only swipes on stored movies may enter it
+        movie_ids = {movie_id for movie_id, _ in swipes}
+        unknown = movie_ids - await self.call(self.db.get_existing_movie_ids, list(movie_ids))
+        if unknown:
+            raise web.HTTPBadRequest(text=f"unknown movies {sorted(unknown)}")
+        # Queued in the shared swipe buffer, so swipes of all clients are written together
+        for movie_id, is_liked in swipes:
+            self.db.add_user_interest(body['user_id'], movie_id, is_liked)
+        return self.reply({'ok': True})
+
+    async def create_group(self, request):
+        """POST /groups {user_id, name} -> {group_id}."""
+        body = await request.json()
+        self.authorize(request, body['user_id'])
+        return self.reply({'group_id': await self.call(self.db.create_group, body['user_id'], body['name'])})
+
+    async def add_group_member(self, request):
+        """POST /groups/{id}/members {user_id, email} -> {ok}; only members may add users."""
+        body = await request.json()
+        self.authorize(request, body['user_id'])
+        return self.reply({'ok': await self.call(
+            self.db.add_group_member, body['user_id'], int(request.match_info['id']), body['email']
+        )})
+
+    async def get_user_groups(self, request):
+        """GET /groups?user_id= -> {group ID: name}."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        return self.reply(await self.call(self.db.get_user_groups, user_id))
+
+    async def get_group_matches(self, request):
+        """GET /groups/{id}/matches?user_id=&min_likes=&after=&limit= -> {movie ID: movie} or null."""
+        user_id = self.int_query(request, 'user_id')
+        self.authorize(request, user_id)
+        min_likes = request.query.get('min_likes')
+        movies = await self.call(
+            self.db.get_group_matches, user_id, int(request.match_info['id']),
+            int(min_likes) if min_likes else None,
+            self.int_query(request, 'after', 0),
+            min(self.int_query(request, 'limit', 20), 100)
+        )
+        return self.reply(movies)
+
+    async def get_poster(self, request):
+        """GET /posters/{poster}?path=&size= -> the image bytes."""
+        data = await self.call(
+            self.db.get_poster, request.match_info['poster'],
+            request.query.get('path'), request.query.get('size')
+        )
+        if data is None:
+            raise web.HTTPNotFound()
+        # A reference always names the same content, clients may cache it for good
+        return web.Response(body=data, content_type='image/jpeg',
+                            headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+    async def ping(self, request):
+        """GET /ping -> {ok}."""
+        return self.reply({'ok': True})
+
+    async def close(self, app):
+        """Write pending swipes and release the connection pool on shutdown."""
+        await self.call(self.db.close)
+        self.executor.shutdown()
+
+    def create_app(self):
+        """
+        Create the aiohttp application with all routes.
+
+        Returns:
+            web.Application: The application.
+        """
+        app = web.Application()
+        app.add_routes([
+            web.get('/ping', self.ping),
+            web.post('/login', self.login),
+            web.post('/signup', self.sign_up),
+            web.get('/connections', self.get_users_connections),
+            web.post('/connections', self.create_connection_request),
+            web.get('/connections/page', self.get_users_connections_page),
+            web.post('/connections/{id:\\d+}/accept', self.accept_connection),
+            web.get('/connections/{id:\\d+}/other', self.get_other_user_from_connection),
+            web.get('/connections/{id:\\d+}/matches', self.get_user_matches),
+            web.get('/connections/{id:\\d+}/matches/page', self.get_user_matches_page),
+            web.get('/changes', self.get_changes),
+            web.get('/changes/marks', self.get_change_marks),
+            web.get('/deck', self.get_movies_for_user),
+            web.post('/swipes', self.add_user_interests),
+            web.get('/groups', self.get_user_groups),
+            web.post('/groups', self.create_group),
+            web.post('/groups/{id:\\d+}/members', self.add_group_member),
+            web.get('/groups/{id:\\d+}/matches', self.get_group_matches),
+            web.get('/posters/{poster}', self.get_poster)
+        ])
+        app.on_cleanup.append(self.close)
+        return app
+
+
+def main():
+    """Parse the command line and run the service until interrupted."""
+    config = get_app_config().get('Service', {})
+    parser = argparse.ArgumentParser(description="MovieTinder swipe and match service")
+    parser.add_argument("--host", default=config.get('Host', '127.0.0.1'))
+    parser.add_argument("--port", type=int, default=config.get('Port', 8080))
+    parser.add_argument("--workers", type=int, default=config.get('Workers', 8),
+                        help="database calls run at the same time")
+    args = parser.parse_args()
+
+    service = SwipeService(Database(), args.workers)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from base import get_app_config
+from metrics import metrics
+
+
+class StartupTimer:
+    """
+    Records how long the phases of application startup take.
+
+    Every phase is measured from the creation of the timer. Once all expected
+    phases have been marked, the timings are printed and appended as one JSON
+    line to the 'Startup.ReportPath' file, so cold-start times can be compared
+    across runs and versions.
+    """
+
+    def __init__(self, expected, started=None):
+        """
+        Initialize the StartupTimer.
+
+        Args:
+            expected (iterable): The phases that complete the report.
+            started (float, optional): The time.perf_counter() value startup began at.
+                Defaults to now.
+        """
+        self.started = time.perf_counter() if started is None else started
+        self.expected = set(expected)
+        self.phases = {}
+        self.report_path = get_app_config().get('Startup', {}).get('ReportPath', '../metrics/startup.jsonl')
+        self.reported = False
+
+    def mark(self, phase):
+        """
+        Record that a phase has completed.
+
+        Args:
+            phase (str): The name of the phase.
+        """
+        if phase in self.phases:
+            return
+        seconds = time.perf_counter() - self.started
+        self.phases[phase] = seconds
+        metrics.observe('startup', phase, seconds)
+        if not self.reported and self.expected <= self.phases.keys():
+            self.report()
+
+    def report(self):
+        """Print the phase timings and append them to the report file."""
+        self.reported = True
+        print("Startup: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases.items()))
+        if not self.report_path:
+            return
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_path, 'a') as file:
+            file.write(json.dumps({
+                'time': time.time(),
+                'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()}
+            }) + '\n')
+
+
+class ConnectSignals(QObject):
+    """Signals emitted by a ConnectWorker."""
+    connected = Signal(object)
+    failed = Signal(str)
+
+
+class ConnectWorker(QRunnable):
+    """A background task that opens the database (or the service client) and prepares the API client."""
+
+    def __init__(self):
+        """Initialize the ConnectWorker."""
+        super().__init__()
+        self.signals = ConnectSignals()
+
+    def run(self):
+        """Open the database, check it answers and set up the response cache off the UI thread."""
+        # Imported here so the login window does not wait for the database drivers
+        from client import open_database, RemoteDatabase
+
+        try:
+            db = open_database()
+            db.ping()
+            if not isinstance(db, RemoteDatabase):
+                import database
+                database.api.get()
+        except Exception as error:
+            self.signals.failed.emit(str(error))
+            return
+        self.signals.connected.emit(db)
+
+
+class DatabaseConnector(QObject):
+    """
+    Connects to the database in the background while the login window is shown.
+
+    `ready` is emitted with the Database once it has an open connection,
+    `failed` with the error message otherwise.
+    """
+    ready = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        """
+        Initialize the DatabaseConnector.
+
+        Args:
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def start(self):
+        """Start connecting."""
+        worker = ConnectWorker()
+        worker.signals.connected.connect(self.ready)
+        worker.signals.failed.connect(self.failed)
+        self.pool.start(worker)
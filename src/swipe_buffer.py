@@ -0,0 +1,102 @@
+import threading
+
+
+class SwipeBuffer:
+    """
+    Collects swipes in memory and writes them to the database in batches.
+
+    A batch is written once `batch_size` swipes are pending or `interval`
+    seconds have passed, whichever comes first. Writes run on a background
+    thread, so recording a swipe never waits for the database. Pending swipes
+    are kept per user, so a read can write just its user's swipes first.
+    """
+
+    def __init__(self, write, batch_size=20, interval=2.0):
+        """
+        Initialize the SwipeBuffer.
+
+        Args:
+            write (callable): Stores a list of (user_id, movie_id, is_liked) tuples.
+            batch_size (int, optional): Number of pending swipes that triggers a write. Defaults to 20.
+            interval (float, optional): Maximum seconds a swipe stays pending. Defaults to 2.0.
+        """
+        self.write = write
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = {}
+        self.count = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = None
+
+    def add(self, user_id, movie_id, is_liked):
+        """
+        Queue a swipe for the next batch.
+
+        Args:
+            user_id (int): The ID of the user.
+            movie_id (int): The ID of the movie.
+            is_liked (bool): Whether the user liked the movie.
+        """
+        with self.lock:
+            self.pending.setdefault(user_id, []).append((user_id, movie_id, is_liked))
+            self.count += 1
+            full = self.count >= self.batch_size
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, daemon=True)
+                self.thread.start()
+        if full:
+            self.wakeup.set()
+
+    def __len__(self):
+        """Return the number of pending swipes."""
+        return self.count
+
+    def flush(self, user_id=None):
+        """
+        Write pending swipes now.
+
+        If the write fails the swipes are queued again and the error is raised.
+
+        Args:
+            user_id (int, optional): Only write the swipes of this user. Defaults to all users.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if user_id is None:
+                    pending, self.pending = self.pending, {}
+                else:
+                    pending = {user_id: self.pending.pop(user_id)} if user_id in self.pending else {}
+                batch = [swipe for swipes in pending.values() for swipe in swipes]
+                self.count -= len(batch)
+            if not batch:
+                return
+            try:
+                self.write(batch)
+            except Exception:
+                with self.lock:
+                    for pending_user_id, swipes in pending.items():
+                        self.pending[pending_user_id] = swipes + self.pending.get(pending_user_id, [])
+                    self.count += len(batch)
+                raise
+
+    def __run(self):
+        """Flush pending swipes whenever the buffer fills up or the interval elapses."""
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the swipes queued and retry on the next tick
+                continue
+
+    def close(self):
+        """Stop the background thread and write the remaining swipes."""
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
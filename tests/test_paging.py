@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from paging import encode_token, decode_token
+
+
+class PageTokenTest(unittest.TestCase):
+    """Continuation tokens round-trip and reject anything they were not made for."""
+
+    def test_round_trip(self):
+        self.assertEqual(decode_token('matches', encode_token('matches', [3, 42]), 2), [3, 42])
+
+    def test_other_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_token('connections', encode_token('matches', [3]), 1)
+
+    def test_wrong_key_length_is_rejected(self):
+        for key in ([], [3, 42]):
+            with self.assertRaises(ValueError):
+                decode_token('connections', encode_token('connections', key), 1)
+
+    def test_malformed_token_is_rejected(self):
+        for token in ('', 'not a token', encode_token('connections', ['3'])):
+            with self.assertRaises(ValueError):
+                decode_token('connections', token, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from database import Database
+from ranking import DeckRanker
+
+# genre_mask bits of genre IDs 1 and 2, see database.genre_bit
+ACTION = 1
+COMEDY = 2
+COMEDY_BIT = 1
+
+
+class DeckRankerTest(unittest.TestCase):
+    """The ranked queue keeps only a few movies but deals them in the full ranking order."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = Database({
+            'Backend': 'sqlite',
+            'Path': os.path.join(self.directory.name, 'movietinder.db'),
+            'Schema': os.path.join(SRC, '..', 'db_sqlite.sql')
+        })
+        self.db.sign_up('a@x', 'pw')
+        self.db.sign_up('b@x', 'pw')
+        # Movies 1-10 alternate between comedy and action, so equal scores sit on both sides of every cut
+        with self.db.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO movies (id, api_id, title, release_date, genre_mask, page) "
+                "VALUES (%s, %s, 'Movie', '2020-01-01', %s, 1)",
+                [(movie_id, movie_id, ACTION if movie_id % 2 else COMEDY) for movie_id in range(1, 11)]
+            )
+
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+
+    def deal(self, ranker, user_id, batch=2):
+        """Return all movies the ranker deals to a user, batch by batch."""
+        dealt = []
+        while True:
+            movie_ids, _ = ranker.next_movies(user_id, batch)
+            if not movie_ids:
+                return dealt
+            dealt += movie_ids
+
+    def swipe(self, *swipes):
+        """Store swipes as (row ID, user ID, movie ID, liked)."""
+        with self.db.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO movie_user_interests (id, user, movie, liked) VALUES (%s, %s, %s, %s)", swipes
+            )
+
+    def test_ties_keep_movie_id_order_across_cuts(self):
+        self.assertEqual(self.deal(DeckRanker(self.db, queue_size=3), 1), list(range(1, 11)))
+
+    def test_small_queue_deals_like_a_full_sort(self):
+        self.swipe((1, 1, 2, True), (2, 1, 3, False))
+        full = self.deal(DeckRanker(self.db, queue_size=100), 1)
+        self.assertEqual(full, [4, 6, 8, 10, 1, 5, 7, 9])
+        self.assertEqual(self.deal(DeckRanker(self.db, queue_size=3), 1), full)
+
+    def test_swipe_committed_late_is_applied_once(self):
+        self.swipe((10, 2, 1, True))
+        ranker = DeckRanker(self.db, queue_size=3, rerank_every=1)
+        ranker.next_movies(1, 1)
+        self.swipe((11, 1, 2, True))
+        ranker.next_movies(1, 1)
+        # Row 5 commits after row 11 was read
+        self.swipe((5, 1, 4, True))
+        ranker.next_movies(1, 1)
+        ranker.next_movies(1, 1)
+        self.assertEqual(ranker.users[1].affinity[COMEDY_BIT], 2)
+        self.assertEqual(ranker.users[1].seen, {2, 4})
+
+    def test_least_recently_served_user_is_evicted(self):
+        ranker = DeckRanker(self.db, max_users=1)
+        ranker.next_movies(1, 2)
+        ranker.next_movies(2, 2)
+        self.assertEqual(list(ranker.users), [2])
+        self.assertEqual(ranker.next_movies(1, 2)[0], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
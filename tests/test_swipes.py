@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from database import Database
+
+
+class RejectedSwipeTest(unittest.TestCase):
+    """A swipe the database rejects must not block other swipes or reads."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = Database({
+            'Backend': 'sqlite',
+            'Path': os.path.join(self.directory.name, 'movietinder.db'),
+            'Schema': os.path.join(SRC, '..', 'db_sqlite.sql')
+        })
+        self.db.sign_up('a@x', 'pw')
+        self.db.sign_up('b@x', 'pw')
+        with self.db.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO movies (api_id, title, release_date, page) VALUES (1, 'Movie', '2020-01-01', 1)"
+            )
+            self.movie_id = cursor.lastrowid
+        self.db.create_connection_request(1, 'b@x')
+        self.db.accept_connection(1)
+
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+
+    def test_unknown_movie_is_dropped(self):
+        self.db.add_user_interest(1, 999999, True)
+        self.db.add_user_interest(1, self.movie_id, True)
+        self.db.add_user_interest(2, self.movie_id, True)
+
+        # Reads write only their user's swipes, user 2's swipe is written by another request
+        self.db.flush_user_interests(2)
+        # Reads that flush first keep working and see the valid swipes
+        self.assertEqual(list(self.db.get_user_matches(1, 1)), [self.movie_id])
+        self.assertEqual(self.db.get_changes(2, 0, 0)['matches'], {1: [self.movie_id]})
+        self.assertEqual(len(self.db.swipes), 0)
+
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT user, movie FROM movie_user_interests ORDER BY user")
+            self.assertEqual(cursor.fetchall(), [(1, self.movie_id), (2, self.movie_id)])
+
+    def test_batch_retried_after_partial_write_stores_each_swipe_once(self):
+        with self.db.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO movies (api_id, title, release_date, page) VALUES (2, 'Other', '2020-01-01', 1)"
+            )
+            other_movie_id = cursor.lastrowid
+        write = self.db._Database__write_user_interests
+        failures = [(1, other_movie_id, True)]
+
+        def failing_write(interests):
+            # The database goes away after the first swipes of the fallback were committed
+            if interests == failures:
+                failures.clear()
+                raise sqlite3.OperationalError("database is locked")
+            write(interests)
+
+        self.db._Database__write_user_interests = failing_write
+        self.db.add_user_interest(1, 999999, True)
+        self.db.add_user_interest(1, self.movie_id, True)
+        self.db.add_user_interest(1, other_movie_id, False)
+        self.db.add_user_interest(1, other_movie_id, True)
+        self.db.flush_user_interests()
+        self.assertEqual(len(self.db.swipes), 4)
+
+        self.db.flush_user_interests()
+        self.assertEqual(len(self.db.swipes), 0)
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT movie, liked FROM movie_user_interests WHERE user = 1 ORDER BY movie")
+            self.assertEqual(cursor.fetchall(), [(self.movie_id, 1), (other_movie_id, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()